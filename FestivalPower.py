@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 
+from year_calendar import YearCalendar
+
 # Define Power Constants
 SPEAKER_POWER_W = 1000 # https://www.lowendtheoryclub.com/how-many-watts-is-the-tomorrowland-2/
 TICKET_STAND_POWER_W = 500 # (10 LED lights, 5 computers)
@@ -12,24 +14,29 @@ CAMPERVAN_OUTLET_POWER_W = 3500 #https://blog.ecoflow.com/uk/motorhome-generator
 LIGHT_POWER_W = 400 # https://commercialledlights.com/blog/outdoor-lighting/led-flood-light-buyers-guide/#:~:text=LED%20flood%20lights%20come%20in,which%20also%20correlates%20to%20heat.
 
 class Stage:
+    __slots__ = ('name', 'speakers', 'lights', 'schedule', 'datetimes', 'on')
+
     def __init__(self, name, speakers, lights, schedule):
         self.name = name
         self.speakers = speakers
         self.lights = lights
         self.schedule = schedule
+        self.datetimes = pd.DatetimeIndex(schedule.iloc[:, 0])
+        self.on = schedule.iloc[:, 1].to_numpy(dtype=float)
 
-    def calculate_stage_power(self):
-        stage_power = self.speakers * SPEAKER_POWER_W + self.lights * STAGE_LIGHT_POWER_W
+    def stage_power_w(self):
+        return self.speakers * SPEAKER_POWER_W + self.lights * STAGE_LIGHT_POWER_W
 
-        stage_power_times = pd.DataFrame(stage_power * self.schedule.iloc[:, 1])
-
-        stage_power_times.insert(0, 'Date Time', self.schedule.iloc[:, 0])
+    def calculate_stage_power(self):
+        stage_power_times = pd.DataFrame({'Date Time': self.datetimes, self.schedule.columns[1]: self.stage_power_w() * self.on})
 
         return stage_power_times
     
 
 class Festival:
-    def __init__(self, name, ticketing_stands, food_stands, drink_stands, toilet_stands, campervan_outlets, lights):
+    __slots__ = ('name', 'ticketing_stands', 'food_stands', 'drink_stands', 'toilet_stands', 'campervan_outlets', 'lights', 'stages', 'calendar', 'total_power')
+
+    def __init__(self, name, ticketing_stands, food_stands, drink_stands, toilet_stands, campervan_outlets, lights, calendar=None):
         self.name = name
         self.ticketing_stands = ticketing_stands
         self.food_stands = food_stands
@@ -38,38 +45,60 @@ class Festival:
         self.campervan_outlets = campervan_outlets
         self.lights = lights
         self.stages = []
-        self.total_power = pd.DataFrame(np.zeros((192, 2)))
+        self.calendar = calendar # Event slots, taken from the first stage's schedule if not given
+        self.total_power = None
 
     def add_stage(self, stage):
         self.stages.append(stage)
+        if self.calendar is None:
+            self.calendar = YearCalendar.from_datetimes(stage.datetimes)
 
-    def calculate_festival_power(self):
-        total_power = pd.DataFrame(np.zeros((192, 2)))
-        total_power.iloc[:, 0] = self.stages[0].schedule.iloc[:, 0]
+    def schedule_matrix(self):
+        """Returns the stages x slots on/off schedule of the event"""
+        return np.array([self.calendar.place(stage.datetimes, stage.on) for stage in self.stages]).reshape(len(self.stages), self.calendar.slots)
+
+    def stage_power_w(self):
+        """Returns the power of each stage when on"""
+        return np.array([stage.stage_power_w() for stage in self.stages], dtype=float)
+
+    def constant_power_w(self):
+        """Returns the power of the equipment running for the whole event"""
+        return (self.ticketing_stands * TICKET_STAND_POWER_W + self.campervan_outlets * CAMPERVAN_OUTLET_POWER_W
+                + self.food_stands * FOOD_STAND_POWER_W + self.drink_stands * DRINK_STAND_POWER_W
+                + self.toilet_stands * TOILET_STAND_POWER_W + self.lights * LIGHT_POWER_W)
+
+    def calculate_power_kw(self, stage_power_w=None, constant_power_w=None):
+        """Returns festival power (kW) per slot from one schedule x stage power product.
+        Pass stage power (stages, scenarios) and constant power (scenarios,) to sweep stage and vendor sizes at once"""
+        stage_power_w = self.stage_power_w() if stage_power_w is None else np.asarray(stage_power_w, dtype=float)
+        constant_power_w = self.constant_power_w() if constant_power_w is None else np.asarray(constant_power_w, dtype=float)
 
         # ------------------- Stages ---------------------
-        for i in range(len(self.stages)):
-            stage_power = self.stages[i].calculate_stage_power().iloc[:, 1]
-            total_power.iloc[:, 1] += stage_power
-        
+        power_w = self.schedule_matrix().T @ stage_power_w
 
         # --------------- Constant power -----------------
-        total_power.iloc[:, 1] += self.ticketing_stands * TICKET_STAND_POWER_W
-        total_power.iloc[:, 1] += self.campervan_outlets * CAMPERVAN_OUTLET_POWER_W
-        total_power.iloc[:, 1] += self.food_stands * FOOD_STAND_POWER_W
-        total_power.iloc[:, 1] += self.drink_stands * DRINK_STAND_POWER_W
-        total_power.iloc[:, 1] += self.toilet_stands * TOILET_STAND_POWER_W
-        total_power.iloc[:, 1] += self.lights * LIGHT_POWER_W
-
-        # total_power.plot(0, 1, legend=None)
-        # plt.ylabel("Power (W)")
-        # plt.show()
+        power_w = power_w + constant_power_w
 
         # Convert to kW
-        total_power.iloc[:, 1] = total_power.iloc[:, 1] / 1000
+        return power_w / 1000
+
+    def calculate_festival_power(self):
+        total_power = pd.DataFrame({0: self.calendar.datetimes(), 1: self.calculate_power_kw()})
 
         self.total_power = total_power
         return total_power
 
     def calculate_peak_festival_power(self):
-        return np.max(self.total_power.iloc[:, 1])
\ No newline at end of file
+        if self.total_power is None:
+            self.calculate_festival_power()
+
+        return np.max(self.total_power.iloc[:, 1])
+
+
+def calculate_festivals_power(festivals, calendar):
+    """Returns the combined power (kW) of several festivals on a year calendar, zero outside the events"""
+    festivals_power = np.zeros(calendar.slots)
+    for festival in festivals:
+        festivals_power[calendar.slot_index(festival.calendar.datetimes())] += festival.calculate_power_kw()
+
+    return festivals_power
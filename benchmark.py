@@ -0,0 +1,170 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import input_cache
+from synthetic_inputs import write_synthetic_inputs, synthetic_wind_data, synthetic_load, LOAD_START
+from generation_modelling import WIND_DATA_FILE, WIND_TIME_STEP_MINUTES, process_wind_data, read_power_curve, calculate_generation
+from load_modelling import CARDRONA_LOAD_FILE, LOAD_TIME_STEP_MINUTES, calculate_annual_load, calculate_average_daily_energy
+from storage_and_grid_modelling import calculate_storage_and_grid_usage
+
+# Data sizes to benchmark: years of data and time step of the wind data
+BENCHMARK_YEARS = [1, 10, 50]
+BENCHMARK_TIME_STEPS_MINUTES = [5, 15, 30]
+QUICK_YEARS = [1]
+QUICK_TIME_STEPS_MINUTES = [15]
+BENCHMARK_REPEATS = 3 # Best of, to keep out one-off slowdowns
+BENCHMARK_SEED = 0
+
+BENCHMARK_BASELINE_FILE = 'Output Data/Benchmark Baseline.json'
+REGRESSION_TOLERANCE = 1.25 # Slower (or more memory) than this multiple of the baseline is reported as a regression
+REGRESSION_MIN_SECONDS = 0.05 # Timing noise of the shortest cases, smaller slowdowns are not regressions
+CASE_COLUMNS = ['Stage', 'Years', 'Time Step (min)']
+
+
+def measure(function, repeats=BENCHMARK_REPEATS):
+    """Returns the best wall time (s) over repeated calls and the peak traced memory (MB) of one more call.
+    Memory is traced in its own call, as tracing slows the timed calls down"""
+    # The models' printed results are not part of the benchmark
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds = np.inf
+        for _ in range(repeats):
+            start = time.perf_counter()
+            function()
+            seconds = min(seconds, time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            function()
+            peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return seconds, peak_memory_bytes / 2 ** 20
+
+
+def benchmark_load(years, rng):
+    """Returns a synthetic total load (datetime, Total KW) covering some years, as calculate_annual_load returns for one"""
+    load = synthetic_load(years, rng=rng)
+    load.columns = ['datetime', 'Total KW']
+
+    return load
+
+
+def benchmark_generation(years, rng):
+    """Returns synthetic generation (datetime, Generation KW) covering the same years as benchmark_load"""
+    wind_data = synthetic_wind_data(years, WIND_TIME_STEP_MINUTES, start=LOAD_START, rng=rng)
+    wind_speed_kph = wind_data.iloc[:, 1].to_numpy()
+
+    return pd.DataFrame({
+        'Month-Date-Time': pd.to_datetime(wind_data['Time'], format='%d/%m/%Y %H:%M'),
+        'Generation KW': np.clip(wind_speed_kph / 3.6 - 3, 0, 9) ** 3 * 5,
+    })
+
+
+def benchmark_cases(years=BENCHMARK_YEARS, time_steps_minutes=BENCHMARK_TIME_STEPS_MINUTES, seed=BENCHMARK_SEED):
+    """Yields (stage, years, time step, rows, function) for every stage at every data size it supports.
+    Runs in a directory holding the synthetic input files, which each case rewrites as it needs.
+    The load files cover one load year at the load time step, so calculate_annual_load only runs at that size"""
+    rng = np.random.default_rng(seed)
+    write_synthetic_inputs(seed=seed)
+    power_curve = read_power_curve()
+
+    yield 'calculate_annual_load', 1, LOAD_TIME_STEP_MINUTES, len(pd.read_excel(CARDRONA_LOAD_FILE)), calculate_annual_load
+
+    for case_years in years:
+        for time_step_minutes in time_steps_minutes:
+            raw_wind_data = synthetic_wind_data(case_years, time_step_minutes, rng=rng)
+            raw_wind_data.to_csv(WIND_DATA_FILE, index=False)
+            yield 'process_wind_data', case_years, time_step_minutes, len(raw_wind_data), process_wind_data
+
+            wind_data = process_wind_data()
+            yield 'calculate_generation', case_years, time_step_minutes, len(wind_data), lambda: calculate_generation(wind_data, power_curve)
+
+        load = benchmark_load(case_years, rng)
+        generation = benchmark_generation(case_years, rng)
+        yield 'calculate_average_daily_energy', case_years, LOAD_TIME_STEP_MINUTES, len(load), lambda: calculate_average_daily_energy(load)
+        yield 'calculate_storage_and_grid_usage', case_years, LOAD_TIME_STEP_MINUTES, len(load), lambda: calculate_storage_and_grid_usage(load, generation, display=False)
+
+
+def run_benchmarks(years=BENCHMARK_YEARS, time_steps_minutes=BENCHMARK_TIME_STEPS_MINUTES, repeats=BENCHMARK_REPEATS, seed=BENCHMARK_SEED):
+    """Times every stage on synthetic inputs of each size, returning rows, wall time, throughput and peak memory per case"""
+    results = []
+    working_directory = os.getcwd()
+    input_cache_enabled = input_cache.INPUT_CACHE_ENABLED
+
+    # Inputs are parsed on every call, so the stages are timed from their source files
+    input_cache.INPUT_CACHE_ENABLED = False
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            for stage, case_years, time_step_minutes, rows, function in benchmark_cases(years, time_steps_minutes, seed):
+                seconds, peak_memory_mb = measure(function, repeats)
+                results.append({
+                    'Stage': stage,
+                    'Years': case_years,
+                    'Time Step (min)': time_step_minutes,
+                    'Rows': rows,
+                    'Time (s)': seconds,
+                    'Throughput (rows/s)': rows / seconds,
+                    'Peak Memory (MB)': peak_memory_mb,
+                })
+    finally:
+        os.chdir(working_directory)
+        input_cache.INPUT_CACHE_ENABLED = input_cache_enabled
+
+    return pd.DataFrame(results)
+
+
+def save_baseline(results, file=BENCHMARK_BASELINE_FILE):
+    """Saves benchmark results as the baseline later runs are compared against"""
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(file, 'w') as baseline_output:
+        json.dump(results.to_dict(orient='records'), baseline_output, indent=4)
+
+
+def read_baseline(file=BENCHMARK_BASELINE_FILE):
+    """Reads saved baseline benchmark results"""
+    with open(file) as baseline_source:
+        return pd.DataFrame(json.load(baseline_source))
+
+
+def compare_to_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Returns the time and memory of each case relative to the baseline, flagging cases beyond the tolerance.
+    Cases missing from either run are left out"""
+    comparison = results.merge(baseline[CASE_COLUMNS + ['Time (s)', 'Peak Memory (MB)']], on=CASE_COLUMNS, suffixes=('', ' Baseline'))
+    comparison['Time Ratio'] = comparison['Time (s)'] / comparison['Time (s) Baseline']
+    comparison['Memory Ratio'] = comparison['Peak Memory (MB)'] / comparison['Peak Memory (MB) Baseline']
+    slower = (comparison['Time Ratio'] > tolerance) & (comparison['Time (s)'] - comparison['Time (s) Baseline'] > REGRESSION_MIN_SECONDS)
+    comparison['Regression'] = slower | (comparison['Memory Ratio'] > tolerance)
+
+    return comparison[CASE_COLUMNS + ['Time (s)', 'Time Ratio', 'Peak Memory (MB)', 'Memory Ratio', 'Regression']]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the modelling stages on synthetic inputs and compares them against a saved baseline')
+    parser.add_argument('--quick', action='store_true', help='only benchmark one year of 15 minute wind data')
+    parser.add_argument('--save-baseline', action='store_true', help='save these results as the new baseline')
+    arguments = parser.parse_args()
+
+    if arguments.quick:
+        results = run_benchmarks(QUICK_YEARS, QUICK_TIME_STEPS_MINUTES)
+    else:
+        results = run_benchmarks()
+    print(results.to_string(index=False, float_format='{:.3f}'.format))
+
+    if arguments.save_baseline or not os.path.exists(BENCHMARK_BASELINE_FILE):
+        save_baseline(results)
+        print("Saved baseline to {}".format(BENCHMARK_BASELINE_FILE))
+    else:
+        comparison = compare_to_baseline(results, read_baseline())
+        print(comparison.to_string(index=False, float_format='{:.3f}'.format))
+        print("{} of {} cases regressed beyond {:.0%} of the baseline".format(comparison['Regression'].sum(), len(comparison), REGRESSION_TOLERANCE - 1))
@@ -0,0 +1,36 @@
+import os
+
+import pandas as pd
+
+from input_cache import CACHE_FORMAT, write_frame, read_frame
+
+# Optional intermediate results, written in the same fast format as the input cache
+CHECKPOINT_DIRECTORY = 'Output Data/Checkpoints'
+
+# Checkpoint names, shared by the stages that write them and the stages that read them back
+LOAD_CHECKPOINT = 'Annual Load'
+WIND_CHECKPOINT = 'Annual Wind Data'
+GENERATION_CHECKPOINT = 'Annual Generation Data'
+
+
+def checkpoint_path(name):
+    """Returns the file path of a named checkpoint"""
+    return os.path.join(CHECKPOINT_DIRECTORY, '{}.{}'.format(name, CACHE_FORMAT))
+
+
+def write_checkpoint(data, name):
+    """Writes an intermediate dataframe or series to a named checkpoint"""
+    if isinstance(data, pd.Series):
+        data = data.reset_index()
+
+    os.makedirs(CHECKPOINT_DIRECTORY, exist_ok=True)
+    write_frame(data, checkpoint_path(name))
+
+
+def read_checkpoint(name):
+    """Reads a named checkpoint back as a dataframe"""
+    file = checkpoint_path(name)
+    if not os.path.exists(file):
+        raise FileNotFoundError("No '{}' checkpoint, run the stage with checkpoint=True first".format(name))
+
+    return read_frame(file)
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+# Time-of-use import prices ($/KWH). Weekday peak and off-peak hours, the rest of the weekday and all of the weekend is shoulder
+IMPORT_PRICES_PER_KWH = {'Peak': 0.32, 'Shoulder': 0.24, 'Off-peak': 0.16}
+PEAK_HOURS = [7, 8, 9, 10, 17, 18, 19, 20]
+OFF_PEAK_HOURS = [23, 0, 1, 2, 3, 4, 5, 6]
+EXPORT_PRICE_PER_KWH = 0.08 # Buy-back rate for energy supplied to the grid
+DEMAND_CHARGE_PER_KW_MONTH = 12.0 # On the peak grid import power of each month
+
+# Capital and operating costs
+TURBINE_CAPEX_PER_KW = 2200 # Per KW of turbine rating
+PV_CAPEX_PER_KWP = 1600
+STORAGE_CAPEX_PER_KWH = 500
+OPEX_FRACTION = 0.02 # Yearly operation and maintenance, as a fraction of capex
+TURBINE_LIFETIME_YEARS = 25
+PV_LIFETIME_YEARS = 25
+STORAGE_LIFETIME_YEARS = 12 # Replaced within the project
+PROJECT_YEARS = 25
+DISCOUNT_RATE = 0.06
+
+GRID_COST_COLUMNS = ['Import Cost ($)', 'Export Revenue ($)', 'Demand Charge ($)']
+
+
+class TariffSchedule:
+    """Import and export price of each step of a datetime series, and the demand charge period (month) each step falls in.
+    The batched dispatch accumulates grid costs with it step by step, grid_costs applies it to whole time series"""
+    __slots__ = ('import_price_per_kwh', 'export_price_per_kwh', 'period', 'periods', 'demand_charge_per_kw', 'years')
+
+    def __init__(self, datetimes, import_prices_per_kwh=IMPORT_PRICES_PER_KWH, peak_hours=PEAK_HOURS, off_peak_hours=OFF_PEAK_HOURS,
+                 export_price_per_kwh=EXPORT_PRICE_PER_KWH, demand_charge_per_kw_month=DEMAND_CHARGE_PER_KW_MONTH):
+        datetimes = pd.DatetimeIndex(datetimes)
+        weekday = datetimes.dayofweek.to_numpy() < 5
+        hour = datetimes.hour.to_numpy()
+
+        self.import_price_per_kwh = np.select([weekday & np.isin(hour, peak_hours), weekday & np.isin(hour, off_peak_hours)],
+                                             [import_prices_per_kwh['Peak'], import_prices_per_kwh['Off-peak']], import_prices_per_kwh['Shoulder'])
+        self.export_price_per_kwh = np.full(len(datetimes), float(export_price_per_kwh))
+
+        # Demand charge periods are the calendar months, numbered in order
+        month = datetimes.year.to_numpy() * 12 + datetimes.month.to_numpy()
+        self.period = np.unique(month, return_inverse=True)[1]
+        self.periods = self.period.max() + 1
+        self.demand_charge_per_kw = np.full(self.periods, float(demand_charge_per_kw_month))
+
+        # Grid costs are annualised over the months covered
+        self.years = self.periods / 12
+
+
+def capital_recovery_factor(rate=DISCOUNT_RATE, years=PROJECT_YEARS):
+    """Returns the fraction of a present cost paid each year to repay it over some years"""
+    return rate * (1 + rate) ** years / ((1 + rate) ** years - 1)
+
+
+def annuity_factor(rate=DISCOUNT_RATE, years=PROJECT_YEARS):
+    """Returns the present value of 1 paid every year for some years"""
+    return 1 / capital_recovery_factor(rate, years)
+
+
+def lifetime_capex(capex, lifetime_years, project_years=PROJECT_YEARS, rate=DISCOUNT_RATE):
+    """Returns the present value of buying equipment and replacing it at the end of each lifetime within the project"""
+    purchase_years = np.arange(0, project_years, lifetime_years)
+
+    return np.asarray(capex, dtype=float) * np.sum((1 + rate) ** -purchase_years.astype(float))
+
+
+def grid_costs(grid_usage_kwh, grid_supply_kwh, schedule, time_step_hours):
+    """Applies a tariff schedule to grid usage and supply time series (KWH per step), one column or more (steps, configurations...).
+    Returns the annual import cost, export revenue and demand charge on each month's peak import power"""
+    grid_usage_kwh = np.asarray(grid_usage_kwh)
+    grid_supply_kwh = np.asarray(grid_supply_kwh)
+
+    import_cost = np.tensordot(schedule.import_price_per_kwh, grid_usage_kwh, axes=(0, 0))
+    export_revenue = np.tensordot(schedule.export_price_per_kwh, grid_supply_kwh, axes=(0, 0))
+
+    # Monthly peaks over the runs of steps in each month
+    period_starts = np.flatnonzero(np.diff(schedule.period, prepend=-1))
+    monthly_peak_kw = np.maximum.reduceat(grid_usage_kwh / time_step_hours, period_starts, axis=0)
+    demand_charge = np.tensordot(schedule.demand_charge_per_kw[schedule.period[period_starts]], monthly_peak_kw, axes=(0, 0))
+
+    return {column: cost / schedule.years for column, cost in zip(GRID_COST_COLUMNS, (import_cost, export_revenue, demand_charge))}
+
+
+def baseline_grid_costs(load_kw, schedule, time_step_hours, discharge_efficiency):
+    """Returns the annual grid costs of supplying the whole load from the grid, counting grid energy as the dispatch does.
+    The costs scale with 1 / discharge efficiency, so an array of efficiencies gives one baseline per design"""
+    load_kw = np.asarray(load_kw, dtype=float)
+    load_costs = grid_costs(load_kw * time_step_hours, np.zeros(len(load_kw)), schedule, time_step_hours)
+
+    return {column: cost / np.asarray(discharge_efficiency, dtype=float) for column, cost in load_costs.items()}
+
+
+def evaluate_costs(grid_cost, capex, lifetimes_years, annual_load_kwh, baseline_annual_cost, rate=DISCOUNT_RATE, project_years=PROJECT_YEARS, opex_fraction=OPEX_FRACTION):
+    """Returns the cost columns of each design from its annual grid costs and the capex of each component.
+    capex and lifetimes_years hold one entry per component (turbines, PV, storage), broadcast against the designs.
+    LCOE is the annual cost of supplying the load per KWH of load, NPV the present value of the savings over grid only supply less the capex"""
+    total_capex = sum(np.asarray(component_capex, dtype=float) for component_capex in capex)
+    present_capex = sum(lifetime_capex(component_capex, lifetime_years, project_years, rate) for component_capex, lifetime_years in zip(capex, lifetimes_years))
+
+    opex = opex_fraction * total_capex
+    net_grid_cost = grid_cost['Import Cost ($)'] + grid_cost['Demand Charge ($)'] - grid_cost['Export Revenue ($)']
+    annual_cost = present_capex * capital_recovery_factor(rate, project_years) + opex + net_grid_cost
+
+    return {
+        'Capex ($)': total_capex,
+        'Opex ($/yr)': opex,
+        'Import Cost ($/yr)': grid_cost['Import Cost ($)'],
+        'Export Revenue ($/yr)': grid_cost['Export Revenue ($)'],
+        'Demand Charge ($/yr)': grid_cost['Demand Charge ($)'],
+        'Annual Cost ($/yr)': annual_cost,
+        'LCOE ($/KWH)': annual_cost / annual_load_kwh,
+        'NPV ($)': annuity_factor(rate, project_years) * (baseline_annual_cost - opex - net_grid_cost) - present_capex,
+    }
+
+
+def design_costs(grid_cost, capex, lifetimes_years, load_kw, schedule, time_step_hours, discharge_efficiency):
+    """Returns the cost columns (evaluate_costs) of designs supplying one load, against that load's grid only baseline"""
+    baseline = baseline_grid_costs(load_kw, schedule, time_step_hours, discharge_efficiency)
+    annual_load_kwh = np.sum(load_kw, dtype=np.float64) * time_step_hours / schedule.years
+
+    return evaluate_costs(grid_cost, capex, lifetimes_years, annual_load_kwh, baseline['Import Cost ($)'] + baseline['Demand Charge ($)'])
+
+
+def storage_result_costs(result, turbine_rating_kw=0, pv_capacity_kwp=0, schedule=None, discharge_efficiency=None):
+    """Costs of one dispatch run (calculate_storage_and_grid_usage), for its storage and the given turbine rating (KW) and PV capacity"""
+    from storage_and_grid_modelling import STORAGE_DISCHARGE_EFFICIENCY # Storage module only needed for single runs
+
+    schedule = TariffSchedule(result.datetimes) if schedule is None else schedule
+    discharge_efficiency = STORAGE_DISCHARGE_EFFICIENCY if discharge_efficiency is None else discharge_efficiency
+    time_series = result.time_series
+
+    grid_cost = grid_costs(time_series['Grid Usage KWH'], time_series['Grid Supply KWH'], schedule, result.time_step_hours)
+    costs = design_costs(grid_cost, [turbine_rating_kw * TURBINE_CAPEX_PER_KW, pv_capacity_kwp * PV_CAPEX_PER_KWP, result.capacity_kwh * STORAGE_CAPEX_PER_KWH],
+                         [TURBINE_LIFETIME_YEARS, PV_LIFETIME_YEARS, STORAGE_LIFETIME_YEARS], time_series['Load (KW)'], schedule, result.time_step_hours, discharge_efficiency)
+
+    return pd.Series({column: float(value) for column, value in costs.items()})
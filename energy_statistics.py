@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+TIME_STEP_HOURS = 0.5 # Half-hourly data
+
+# Meteorological seasons (southern hemisphere)
+SEASONS = {12: 'Summer', 1: 'Summer', 2: 'Summer',
+           3: 'Autumn', 4: 'Autumn', 5: 'Autumn',
+           6: 'Winter', 7: 'Winter', 8: 'Winter',
+           9: 'Spring', 10: 'Spring', 11: 'Spring'}
+
+
+def period_keys(days):
+    """Returns the week (starting Monday), month and season of each day"""
+    return {
+        'weekly': days - pd.to_timedelta(days.dayofweek, unit='D'),
+        'monthly': days.to_period('M'),
+        'seasonal': pd.Index(days.month).map(SEASONS),
+    }
+
+
+def summary_frame(period, labels, energy_kwh, peak_kw, samples):
+    """Builds the energy and peak summary of one period, with a column level per scenario for 2D power"""
+    if energy_kwh.ndim == 1:
+        summary = pd.DataFrame({'Energy (KWH)': energy_kwh, 'Peak (KW)': peak_kw, 'Samples': samples}, index=labels)
+    else:
+        summary = pd.concat({'Energy (KWH)': pd.DataFrame(energy_kwh, index=labels), 'Peak (KW)': pd.DataFrame(peak_kw, index=labels)}, axis=1)
+        summary['Samples'] = samples
+
+    summary.index.name = period
+
+    return summary
+
+
+def group_totals(codes, groups, energy_kwh, peak_kw, samples):
+    """Sums energy and samples and takes the peak power of rows sharing a group code"""
+    group_energy_kwh = np.zeros((groups,) + energy_kwh.shape[1:])
+    group_peak_kw = np.full((groups,) + peak_kw.shape[1:], -np.inf)
+    np.add.at(group_energy_kwh, codes, energy_kwh)
+    np.maximum.at(group_peak_kw, codes, peak_kw)
+
+    return group_energy_kwh, group_peak_kw, np.bincount(codes, weights=samples, minlength=groups).astype(np.int64)
+
+
+def aggregate_energy(datetimes, power_kw, time_step_hours=TIME_STEP_HOURS):
+    """Returns daily, weekly, monthly and seasonal energy totals (KWH) and peaks (KW) of any power series
+    (load, generation, grid import/export, storage). Power is one series (steps,) or one column per scenario (steps, scenarios)"""
+    power_kw = np.asarray(power_kw, dtype=float)
+
+    # Only the daily totals pass over every step, longer periods are built from the days
+    day_codes, days = pd.factorize(pd.DatetimeIndex(datetimes).normalize())
+    daily = group_totals(day_codes, len(days), power_kw * time_step_hours, power_kw, np.ones(len(power_kw)))
+
+    summaries = {'daily': summary_frame('daily', days, *daily)}
+    for period, keys in period_keys(pd.DatetimeIndex(days)).items():
+        codes, labels = pd.factorize(keys)
+        summaries[period] = summary_frame(period, labels, *group_totals(codes, len(labels), *daily))
+
+    return summaries
+
+
+def average_daily_energy(datetimes, power_kw, time_step_hours=TIME_STEP_HOURS):
+    """Returns the average energy (KWH) per complete day"""
+    daily = aggregate_energy(datetimes, power_kw, time_step_hours)['daily']
+    complete_days = daily['Samples'] == round(24 / time_step_hours)
+
+    return daily.loc[complete_days, 'Energy (KWH)'].mean()
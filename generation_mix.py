@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+from cost_modelling import TURBINE_CAPEX_PER_KW, PV_CAPEX_PER_KWP, STORAGE_CAPEX_PER_KWH, TURBINE_LIFETIME_YEARS, PV_LIFETIME_YEARS, STORAGE_LIFETIME_YEARS, \
+    GRID_COST_COLUMNS, TariffSchedule, design_costs
+from generation_modelling import WIND_TIME_STEP_MINUTES, WIND_SLOTS_PER_DAY, ROUNDING_MODE, model_generation
+from solar_modelling import SOLAR_TIME_STEP_MINUTES, IRRADIANCE_COLUMN, AIR_TEMPERATURE_COLUMN, pv_power_kw
+from storage_and_grid_modelling import STORAGE_CHARGE_EFFICIENCY, STORAGE_DISCHARGE_EFFICIENCY, TIME_STEP_HOURS, BATCH_TIME_SERIES_COLUMNS, BATCH_TIME_SERIES_DTYPE, dispatch_storage_batch, time_series_buffer
+from year_calendar import YearCalendar, month_date_time_slot
+
+# --------------------- Hybrid design grid -------------------
+WIND_TURBINE_QUANTITIES = [0, 1, 2, 3]
+PV_CAPACITIES_KWP = [0, 500, 1000, 2000]
+STORAGE_CAPACITIES_KWH = [0, 500, 1000, 2000, 5000]
+
+
+class GenerationSource:
+    """One kind of generation as its output (KW) per unit of size (one turbine, one kWp) on every leap-year slot.
+    Output is linear in size, so any mix of sources is a weighted sum of their unit outputs, and so is their capex"""
+    __slots__ = ('name', 'unit', 'unit_generation_kw', 'time_step_minutes', 'unit_capex', 'lifetime_years')
+
+    def __init__(self, name, unit, unit_generation_kw, time_step_minutes, unit_capex=0, lifetime_years=TURBINE_LIFETIME_YEARS):
+        self.name = name
+        self.unit = unit
+        self.unit_generation_kw = np.asarray(unit_generation_kw, dtype=float)
+        self.time_step_minutes = time_step_minutes
+        self.unit_capex = unit_capex
+        self.lifetime_years = lifetime_years
+
+    def size_column(self):
+        """Returns the name of the column holding this source's size in sweep results"""
+        return '{} ({})'.format(self.name, self.unit)
+
+    def on_calendar(self, calendar):
+        """Returns the unit output (KW) for each slot of a calendar"""
+        return calendar.from_climatology(self.unit_generation_kw, self.time_step_minutes)
+
+
+def wind_source(wind_data, power_curve, turbine_model, cut_in_speed_ms, cut_out_speed_ms, rounding=ROUNDING_MODE):
+    """Returns the output of one wind turbine from the averaged wind data (process_wind_data), costed by its rating (peak of the power curve)"""
+    if isinstance(wind_data, pd.Series):
+        wind_data = wind_data.reset_index()
+
+    unit_generation = model_generation(wind_data, power_curve, 1, cut_in_speed_ms, cut_out_speed_ms, rounding)
+    unit_generation_kw = np.full(366 * WIND_SLOTS_PER_DAY, np.nan)
+    unit_generation_kw[month_date_time_slot(unit_generation['Month-Date-Time'], WIND_TIME_STEP_MINUTES)] = unit_generation['Generation KW']
+
+    return GenerationSource(turbine_model, 'turbines', unit_generation_kw, WIND_TIME_STEP_MINUTES, max(power_curve.values()) * TURBINE_CAPEX_PER_KW, TURBINE_LIFETIME_YEARS)
+
+
+def solar_source(solar_climatology):
+    """Returns the output of one kWp of PV from the averaged solar data (process_solar_data)"""
+    unit_generation_kw = pv_power_kw(solar_climatology[IRRADIANCE_COLUMN], solar_climatology[AIR_TEMPERATURE_COLUMN])
+
+    return GenerationSource('Solar PV', 'kWp', unit_generation_kw, SOLAR_TIME_STEP_MINUTES, PV_CAPEX_PER_KWP, PV_LIFETIME_YEARS)
+
+
+def unit_generation_on_load(sources, load, time_step_minutes=int(TIME_STEP_HOURS * 60)):
+    """Returns the unit output (KW) of every source at each load datetime, one column per source"""
+    calendar = YearCalendar(load.iloc[0, 0], time_step_minutes)
+    unit_generation_kw = np.column_stack([source.on_calendar(calendar) for source in sources])
+
+    return unit_generation_kw[calendar.slot_index(load.iloc[:, 0])]
+
+
+def mix_generation_kw(unit_generation_kw, sizes):
+    """Returns the generation (KW) of every combination of source sizes, shaped (slots, sizes of source 1, sizes of source 2, ...).
+    Each source adds its unit output times its sizes along its own axis"""
+    slots, source_count = unit_generation_kw.shape
+    unit_shape = (slots,) + (1,) * source_count
+    generation_kw = np.zeros(unit_shape)
+    for source, source_sizes in enumerate(sizes):
+        axis_shape = [1] * source_count
+        axis_shape[source] = len(source_sizes)
+        generation_kw = generation_kw + unit_generation_kw[:, source].reshape(unit_shape) * np.asarray(source_sizes, dtype=float).reshape(axis_shape)
+
+    return generation_kw
+
+
+def sweep_generation_mix(load, sources, sizes, capacities_kwh, charge_efficiency=STORAGE_CHARGE_EFFICIENCY, discharge_efficiency=STORAGE_DISCHARGE_EFFICIENCY,
+                         time_series_file=None, costs=True):
+    """Dispatches every combination of source sizes and storage capacity in one batch, one summary row per combination.
+    sizes holds the sizes to sweep for each source, in the same order as sources. With a time series file, the stored energy
+    and grid usage/supply of every combination are also written to it (memory-mapped .npy, shaped slots x sizes of each source x capacities).
+    With costs, the tariff is applied within the dispatch and every combination gets its capex, annual costs, LCOE and NPV"""
+    load_kw = load['Total KW'].to_numpy(dtype=float)
+    tariff = TariffSchedule(load.iloc[:, 0]) if costs else None
+    unit_generation_kw = unit_generation_on_load(sources, load)
+
+    # Storage capacities take the last axis, after one axis per source
+    generation_kw = mix_generation_kw(unit_generation_kw, sizes)[..., np.newaxis]
+    configurations = np.broadcast_shapes(generation_kw.shape[1:], np.shape(capacities_kwh), np.shape(charge_efficiency), np.shape(discharge_efficiency))
+    time_series = None if time_series_file is None else time_series_buffer((len(load_kw),) + configurations, BATCH_TIME_SERIES_COLUMNS, BATCH_TIME_SERIES_DTYPE, time_series_file)
+
+    summary = dispatch_storage_batch(load_kw.reshape((len(load_kw),) + (1,) * (generation_kw.ndim - 1)), generation_kw, capacities_kwh, charge_efficiency, discharge_efficiency,
+                                     time_series=time_series, tariff=tariff)
+    if time_series is not None:
+        time_series.flush()
+
+    grid = np.meshgrid(*[np.asarray(source_sizes, dtype=float) for source_sizes in sizes], indexing='ij')
+    sweep = pd.DataFrame({source.size_column(): np.ravel(np.broadcast_to(size[..., np.newaxis], summary['Storage Capacity (KWH)'].shape)) for source, size in zip(sources, grid)})
+    for column, values in summary.items():
+        if column not in GRID_COST_COLUMNS:
+            sweep[column] = np.ravel(values)
+    sweep['Annual Generation (KWH)'] = np.ravel(np.broadcast_to(generation_kw.sum(axis=0) * TIME_STEP_HOURS, summary['Storage Capacity (KWH)'].shape))
+
+    if costs:
+        capex = [source.unit_capex * sweep[source.size_column()] for source in sources] + [STORAGE_CAPEX_PER_KWH * sweep['Storage Capacity (KWH)']]
+        lifetimes_years = [source.lifetime_years for source in sources] + [STORAGE_LIFETIME_YEARS]
+        grid_cost = {column: np.ravel(summary[column]) for column in GRID_COST_COLUMNS}
+        for column, values in design_costs(grid_cost, capex, lifetimes_years, load_kw, tariff, TIME_STEP_HOURS, sweep['Discharge Efficiency'].to_numpy()).items():
+            sweep[column] = values
+
+    return sweep
+
+
+if __name__ == "__main__":
+    from load_modelling import calculate_annual_load, get_total_load
+    from generation_modelling import WIND_TURBINE_MODEL, CUT_IN_SPEED_MS, CUT_OUT_SPEED_MS, process_wind_data, read_power_curve
+    from solar_modelling import process_solar_data
+
+    annual_load = get_total_load(calculate_annual_load())
+    sources = [wind_source(process_wind_data(), read_power_curve(), WIND_TURBINE_MODEL, CUT_IN_SPEED_MS, CUT_OUT_SPEED_MS), solar_source(process_solar_data())]
+
+    print("------------ Hybrid Generation Mix -----------")
+    sweep = sweep_generation_mix(annual_load, sources, [WIND_TURBINE_QUANTITIES, PV_CAPACITIES_KWP], STORAGE_CAPACITIES_KWH)
+    print(sweep.sort_values('NPV ($)', ascending=False).head(20).to_string(index=False))
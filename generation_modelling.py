@@ -1,10 +1,16 @@
 import pandas as pd
 import numpy as np
 
+from input_cache import read_cached, read_excel
+from checkpoints import LOAD_CHECKPOINT, WIND_CHECKPOINT, GENERATION_CHECKPOINT, write_checkpoint, read_checkpoint
+from profiling import profiled
+from solar_modelling import PV_CAPACITY_KWP, process_solar_data, add_solar_generation
+from output_backend import OUTPUT_FORMAT, write_output as write_output_file
+from year_calendar import YearCalendar, slots_per_day, leap_year_slot, leap_year_slot_labels, month_date_time_slot
+
 #Input and Output files
 WIND_DATA_FILE = 'Input Data/Wind Cardrona.csv'
 POWER_CURVE_DATA_FILE = 'Input Data/Tubine Power Curve.xlsx'
-OUTPUT_LOAD_FILE = 'Output Data/Annual Load.xlsx'
 OUTPUT_ANNUAL_WIND_DATA = 'Output Data/Annual Wind Data.xlsx'
 OUTPUT_ANNUAL_GENERATION_DATA = 'Output Data/Annual Generation Data.xlsx'
 
@@ -24,21 +30,100 @@ CUT_OUT_SPEED_MS = 23
 # CUT_IN_SPEED_MS = 3
 # CUT_OUT_SPEED_MS = 25
 
+GENERATION_YEAR_START = '2022-09-01' # Default start of the modelled year, main uses the start of the load data
+
+# Streaming wind climatology, one slot per 15 minute reading on a leap-year calendar
+WIND_TIME_STEP_MINUTES = 15
+WIND_SLOTS_PER_DAY = slots_per_day(WIND_TIME_STEP_MINUTES)
+WIND_CHUNK_ROWS = 100000
+PERCENTILE_BIN_WIDTH_MS = 0.5 # Wind speed histogram per slot used for percentiles
+PERCENTILE_MAX_SPEED_MS = 60
+
+# Power curve lookup, 'nearest-half' rounds wind speed to the 0.5 m/s curve points, 'linear' interpolates between them
+ROUNDING_MODES = ('nearest-half', 'linear')
+ROUNDING_MODE = 'nearest-half'
+
 def get_annual_load():
-    """Reads Output Load file and returns Total KW annual load"""
-    overall_power = pd.read_excel(OUTPUT_LOAD_FILE)
+    """Reads the annual load checkpoint and returns Total KW annual load"""
+    overall_power = read_checkpoint(LOAD_CHECKPOINT)
     total_power = overall_power['Total KW']
     
     return total_power
 
-def process_wind_data():
-    """Reads wind data file, performs averaging across years"""
-    raw_wind_data = pd.read_csv(WIND_DATA_FILE)
+def parse_wind_data(file):
+    """Reads a wind data file and parses its timestamps"""
+    raw_wind_data = pd.read_csv(file)
     
     wind_data = pd.concat([raw_wind_data['Time'], raw_wind_data['Cardrona - Ridgeline Stn 15min: WindSpd_kph_mean[KPH]']], axis=1)
+    wind_data['Time'] = pd.to_datetime(wind_data['Time'], dayfirst=True)
+
+    return wind_data
+
+def read_wind_data():
+    """Returns the parsed wind data, cached after the first read"""
+    return read_cached(WIND_DATA_FILE, parse_wind_data)
+
+def histogram_percentiles(histogram, percentiles):
+    """Estimates percentiles from per-slot wind speed histograms, interpolating within the bin"""
+    cumulative = histogram.cumsum(axis=1)
+    rows = np.arange(len(histogram))
+    estimates = {}
+    for percentile in percentiles:
+        target = cumulative[:, -1] * percentile / 100
+        bin_index = np.minimum((cumulative < target[:, np.newaxis]).sum(axis=1), histogram.shape[1] - 1)
+        bin_count = histogram[rows, bin_index]
+        below_bin = cumulative[rows, bin_index] - bin_count
+        estimates[f'P{percentile:g} (m/s)'] = (bin_index + (target - below_bin) / np.maximum(bin_count, 1)) * PERCENTILE_BIN_WIDTH_MS
+
+    return estimates
+
+def stream_wind_climatology(file=WIND_DATA_FILE, chunk_rows=WIND_CHUNK_ROWS, percentiles=None):
+    """Reads a wind data file in chunks, keeping running sums and counts per day of year/time of day slot.
+    Memory stays constant however many years the file covers. Optionally estimates percentiles per slot"""
+    slots = 366 * WIND_SLOTS_PER_DAY
+    slot_sums = np.zeros(slots)
+    slot_counts = np.zeros(slots, dtype=np.int64)
+    if percentiles:
+        histogram = np.zeros((slots, int(np.ceil(PERCENTILE_MAX_SPEED_MS / PERCENTILE_BIN_WIDTH_MS))), dtype=np.int32)
+
+    for chunk in pd.read_csv(file, usecols=['Time', 'Cardrona - Ridgeline Stn 15min: WindSpd_kph_mean[KPH]'], chunksize=chunk_rows):
+        wind_speed_kph = chunk['Cardrona - Ridgeline Stn 15min: WindSpd_kph_mean[KPH]'].to_numpy(dtype=float)
+
+        # Remove anomolies (where sensor was not recording data)
+        recording = (wind_speed_kph != 0) & ~np.isnan(wind_speed_kph)
+        slot = leap_year_slot(pd.to_datetime(chunk['Time'][recording], dayfirst=True), WIND_TIME_STEP_MINUTES)
+        wind_speed_ms = wind_speed_kph[recording] / 3.6
+
+        slot_sums += np.bincount(slot, weights=wind_speed_ms, minlength=slots)
+        slot_counts += np.bincount(slot, minlength=slots)
+        if percentiles:
+            speed_bin = np.clip((wind_speed_ms / PERCENTILE_BIN_WIDTH_MS).astype(int), 0, histogram.shape[1] - 1)
+            np.add.at(histogram, (slot, speed_bin), 1)
+
+    # Only keep slots with data, as the groupby in process_wind_data does
+    recorded = slot_counts > 0
+    climatology = pd.DataFrame({
+        'Mean (m/s)': slot_sums[recorded] / slot_counts[recorded],
+        'Count': slot_counts[recorded],
+    }, index=pd.Index(leap_year_slot_labels(WIND_TIME_STEP_MINUTES)[recorded], name='Month-Date-Time'))
+
+    if percentiles:
+        for column, values in histogram_percentiles(histogram[recorded], percentiles).items():
+            climatology[column] = values
+
+    return climatology
+
+@profiled
+def process_wind_data(streaming=False, wind_data=None):
+    """Reads wind data file (unless already parsed wind data is given), performs averaging across years.
+    The streaming mode reads the file in chunks instead of loading it all into memory"""
+    if streaming:
+        annual_mean = stream_wind_climatology()['Mean (m/s)']
+        return annual_mean.rename('Cardrona - Ridgeline Stn 15min: Wind Speed Mean (m/s)')
+
+    wind_data = read_wind_data() if wind_data is None else wind_data.copy()
     
     # Add new column which just contains day/month time (becomes independent of year)
-    wind_data['Time'] = pd.to_datetime(wind_data['Time'], dayfirst=True)
     wind_data['Month-Date-Time'] = wind_data['Time'].dt.strftime('%m-%d %H:%M:%S')
 
     # Remove anomolies (where sensor was not recording data)
@@ -53,62 +138,166 @@ def process_wind_data():
 
     return annual_mean
 
-def read_power_curve():
-    power_curve = pd.read_excel(POWER_CURVE_DATA_FILE)
+def read_power_curves():
+    """Reads the turbine power curve workbook, one power output column per turbine model"""
+    return read_excel(POWER_CURVE_DATA_FILE)
 
-    power_curve = dict(zip(power_curve.iloc[:, 0], power_curve[f'{WIND_TURBINE_MODEL} Power Output (KW)']))
+@profiled
+def read_power_curve(turbine_model=None, power_curves=None):
+    """Returns a wind speed to power output (KW) lookup for a turbine model"""
+    turbine_model = WIND_TURBINE_MODEL if turbine_model is None else turbine_model
+    power_curves = read_power_curves() if power_curves is None else power_curves
+
+    power_curve = dict(zip(power_curves.iloc[:, 0], power_curves[f'{turbine_model} Power Output (KW)']))
 
     return power_curve
 
 
 def round_to_nearest_half(number):
-    # Multiply the number by 2 to work with integer values
-    rounded_number = round(number * 2)
+    # Multiply the number by 2 to work with integer values (rounds halves to even, same as round())
+    rounded_number = np.round(number * 2)
     
     # Divide by 2 to get back to the original scale
     return rounded_number / 2
 
 
-def calculate_generation(wind_data, power_curve):
-    """Calculates generation based on cut-in and cut-out speed, turbine power and number of turbines"""
-    print("Wind Turbine model: {} Wind Turbine Quantity: {}".format(WIND_TURBINE_MODEL, WIND_TURBINE_QUANTITY))
+def power_curve_arrays(power_curves):
+    """Returns the sorted wind speeds, power outputs (KW) and model names of every turbine in the power curve sheet"""
+    power_curves = power_curves.sort_values(power_curves.columns[0])
+    power_columns = [column for column in power_curves.columns[1:] if column.endswith(' Power Output (KW)')]
+
+    wind_speeds = power_curves.iloc[:, 0].to_numpy(dtype=float)
+    power_outputs = power_curves[power_columns].to_numpy(dtype=float)
+    turbine_models = [column[:-len(' Power Output (KW)')] for column in power_columns]
+
+    return wind_speeds, power_outputs, turbine_models
+
+
+def interpolate_power_curve(wind_speed_ms, curve_wind_speeds, curve_power_outputs, rounding=ROUNDING_MODE):
+    """Looks up turbine power output (KW) for an array of wind speeds.
+    'nearest-half' rounds speeds to the nearest 0.5 m/s before lookup, 'linear' interpolates between curve points.
+    Speeds outside the power curve produce no power. Accepts one curve (points,) or several (points, turbines)"""
+    if rounding not in ROUNDING_MODES:
+        raise ValueError("Unknown rounding mode '{}', expected one of {}".format(rounding, ROUNDING_MODES))
+
+    wind_speed_ms = np.asarray(wind_speed_ms, dtype=float)
+    if rounding == 'nearest-half':
+        wind_speed_ms = round_to_nearest_half(wind_speed_ms)
+
+    # Curve values broadcast against speeds for one curve (points,) or several (points, turbines)
+    speed_shape = wind_speed_ms.shape + (1,) * (curve_power_outputs.ndim - 1)
+
+    # Find the curve segment for each speed, then weight between its two end points
+    upper_index = np.clip(np.searchsorted(curve_wind_speeds, wind_speed_ms, side='right'), 1, len(curve_wind_speeds) - 1)
+    lower_index = upper_index - 1
+    weight = (wind_speed_ms - curve_wind_speeds[lower_index]) / (curve_wind_speeds[upper_index] - curve_wind_speeds[lower_index])
+
+    lower_power = curve_power_outputs[lower_index]
+    power_output = lower_power + weight.reshape(speed_shape) * (curve_power_outputs[upper_index] - lower_power)
+
+    # The last curve point is an exact lookup, anything beyond the curve is out of range
+    at_end = wind_speed_ms == curve_wind_speeds[-1]
+    on_curve = (wind_speed_ms >= curve_wind_speeds[0]) & (wind_speed_ms <= curve_wind_speeds[-1])
+    power_output = np.where(at_end.reshape(speed_shape), curve_power_outputs[-1], power_output)
 
-    wind_data = pd.read_excel(OUTPUT_ANNUAL_WIND_DATA)
+    return np.where(on_curve.reshape(speed_shape), power_output, 0)
+
+
+def generating_power(wind_speed_ms, cut_in_speed_ms, cut_out_speed_ms):
+    """Returns 1 when generating power (within cut-in and cut-out wind speed), otherwise 0"""
+    return np.where((wind_speed_ms >= cut_in_speed_ms) & (wind_speed_ms < cut_out_speed_ms), 1, 0)
+
+
+def model_generation(wind_data, power_curve, turbine_quantity, cut_in_speed_ms, cut_out_speed_ms, rounding=ROUNDING_MODE):
+    """Calculates generation (KW) for a Month-Date-Time and wind speed dataframe"""
+    wind_speed_ms = wind_data['Cardrona - Ridgeline Stn 15min: Wind Speed Mean (m/s)'].to_numpy(dtype=float)
+    curve_wind_speeds = np.array(sorted(power_curve), dtype=float)
+    curve_power_outputs = np.array([power_curve[wind_speed] for wind_speed in sorted(power_curve)], dtype=float)
+
+    # Calculate generation based on turbine power and number of turbines
+    power_output = interpolate_power_curve(wind_speed_ms, curve_wind_speeds, curve_power_outputs, rounding)
+    generation = wind_data.iloc[:, [0]].copy()  # Copy the selected columns
+    generation['Generation KW'] = generating_power(wind_speed_ms, cut_in_speed_ms, cut_out_speed_ms) * (power_output * turbine_quantity)
+
+    return generation
+
+
+def model_generation_all_turbines(wind_data, power_curves, turbine_quantity, cut_in_speed_ms, cut_out_speed_ms, rounding=ROUNDING_MODE):
+    """Calculates generation (KW) of every turbine model in the power curve sheet in one pass, one column per model"""
+    wind_speed_ms = wind_data['Cardrona - Ridgeline Stn 15min: Wind Speed Mean (m/s)'].to_numpy(dtype=float)
+    curve_wind_speeds, curve_power_outputs, turbine_models = power_curve_arrays(power_curves)
+
+    power_output = interpolate_power_curve(wind_speed_ms, curve_wind_speeds, curve_power_outputs, rounding)
+    generating = generating_power(wind_speed_ms, cut_in_speed_ms, cut_out_speed_ms)[:, np.newaxis]
+
+    generation = pd.DataFrame(generating * (power_output * turbine_quantity), columns=[f'{turbine_model} Generation KW' for turbine_model in turbine_models])
+    generation.insert(0, wind_data.columns[0], wind_data.iloc[:, 0].to_numpy())
+
+    return generation
+
+
+def reorder_generation(generation, year_start=GENERATION_YEAR_START):
+    """Places the Month-Date-Time generation onto the modelled year's calendar (Feb 29th is only used in leap years)"""
+    calendar = YearCalendar(year_start, WIND_TIME_STEP_MINUTES)
+
+    # One generation value per leap-year slot, then pick each calendar slot's value by index
+    climatology = np.full(366 * slots_per_day(WIND_TIME_STEP_MINUTES), np.nan)
+    climatology[month_date_time_slot(generation['Month-Date-Time'], WIND_TIME_STEP_MINUTES)] = generation['Generation KW']
+
+    reordered_generation = pd.DataFrame({'Month-Date-Time': calendar.datetimes(), 'Generation KW': calendar.from_climatology(climatology, WIND_TIME_STEP_MINUTES)})
+
+    return reordered_generation
+
+
+def display_results(wind_data, turbine_model, turbine_quantity, cut_in_speed_ms, cut_out_speed_ms):
+    """Prints the turbine choice and how often it generates power for the annual wind data"""
+    print("Wind Turbine model: {} Wind Turbine Quantity: {}".format(turbine_model, turbine_quantity))
 
     # Determine when generating power (within cut-in and cut-out wind speed)
-    wind_data.loc[:, 'Generating Power'] = np.where((wind_data['Cardrona - Ridgeline Stn 15min: Wind Speed Mean (m/s)'] >= CUT_IN_SPEED_MS) & (wind_data['Cardrona - Ridgeline Stn 15min: Wind Speed Mean (m/s)'] < CUT_OUT_SPEED_MS), 1, 0)
-    
-    percentage_time_generating = np.sum(wind_data['Generating Power'] / len(wind_data) * 100)
+    percentage_time_generating = np.sum(generating_power(wind_data['Cardrona - Ridgeline Stn 15min: Wind Speed Mean (m/s)'], cut_in_speed_ms, cut_out_speed_ms) / len(wind_data) * 100)
     print("Generating power {:.2f}% of time".format(percentage_time_generating))
+
+
+@profiled
+def calculate_generation(wind_data, power_curve, turbine_model=None, turbine_quantity=None, cut_in_speed_ms=None, cut_out_speed_ms=None, rounding=ROUNDING_MODE):
+    """Calculates generation from the in-memory annual wind data based on cut-in and cut-out speed, turbine power and number of turbines"""
+    turbine_model = WIND_TURBINE_MODEL if turbine_model is None else turbine_model
+    turbine_quantity = WIND_TURBINE_QUANTITY if turbine_quantity is None else turbine_quantity
+    cut_in_speed_ms = CUT_IN_SPEED_MS if cut_in_speed_ms is None else cut_in_speed_ms
+    cut_out_speed_ms = CUT_OUT_SPEED_MS if cut_out_speed_ms is None else cut_out_speed_ms
+
+    # Annual mean wind speed series from process_wind_data, with Month-Date-Time as a column
+    if isinstance(wind_data, pd.Series):
+        wind_data = wind_data.reset_index()
+
+    display_results(wind_data, turbine_model, turbine_quantity, cut_in_speed_ms, cut_out_speed_ms)
     
-    # Calculate generation based on turbine power and number of turbines
-    generation = wind_data.iloc[:, [0, 1, 2]].copy()  # Copy the selected columns
-    for (index, row) in generation.iterrows():
-        wind_speed_rounded = round_to_nearest_half(row['Cardrona - Ridgeline Stn 15min: Wind Speed Mean (m/s)'])
-        
-        generation.iloc[index, 2] *= power_curve[wind_speed_rounded] * WIND_TURBINE_QUANTITY
-    
-    generation = generation.drop(columns=['Cardrona - Ridgeline Stn 15min: Wind Speed Mean (m/s)'])
-    generation = generation.rename(columns={'Generating Power': 'Generation KW'})
+    generation = model_generation(wind_data, power_curve, turbine_quantity, cut_in_speed_ms, cut_out_speed_ms, rounding)
 
     return generation
 
 
-def write_output(data, file):
-    """Write to Excel Speadsheet"""
-    data.to_excel(file, sheet_name='Sheet1')
+def write_output(data, file, output_format=OUTPUT_FORMAT):
+    """Writes wind or generation data, Excel only when asked for"""
+    return write_output_file(data, file, output_format)
 
 
-def calculate_annual_generation():
+def calculate_annual_generation(checkpoint=False, pv_capacity_kwp=PV_CAPACITY_KWP):
+    """Calculates wind generation, adding solar PV generation when given a PV capacity"""
 
     wind_data = process_wind_data()
 
-    # write_output(wind_data, OUTPUT_ANNUAL_WIND_DATA)
+    if checkpoint:
+        write_checkpoint(wind_data, WIND_CHECKPOINT)
 
     turbine_power_curve = read_power_curve()
 
     annual_generation = calculate_generation(wind_data, turbine_power_curve)
 
-    # write_output(annual_generation, OUTPUT_ANNUAL_GENERATION_DATA)
+    if pv_capacity_kwp > 0:
+        annual_generation = add_solar_generation(annual_generation, process_solar_data(), pv_capacity_kwp)
+
+    if checkpoint:
+        write_checkpoint(annual_generation, GENERATION_CHECKPOINT)
 
     return annual_generation
\ No newline at end of file
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow # Feather needs pyarrow, fall back to pickle without it
+except ImportError:
+    pyarrow = None
+
+# Parsed input frames are stored here, keyed by source file and parser
+CACHE_DIRECTORY = 'Input Data/Cache'
+INPUT_CACHE_ENABLED = True
+CACHE_FORMAT = 'feather' if pyarrow is not None else 'pickle'
+
+
+def file_hash(file):
+    """Returns the SHA-256 hash of a file's contents"""
+    file_digest = hashlib.sha256()
+    with open(file, 'rb') as source:
+        for block in iter(lambda: source.read(1 << 20), b''):
+            file_digest.update(block)
+
+    return file_digest.hexdigest()
+
+
+def source_hash(file):
+    """Returns the SHA-256 hash of a source file, kept in the cache with the file's size and mtime.
+    The file is only hashed again when its size or mtime change"""
+    if not INPUT_CACHE_ENABLED:
+        return file_hash(file)
+
+    key = hashlib.sha1(os.path.abspath(file).encode()).hexdigest()
+    hash_file = os.path.join(CACHE_DIRECTORY, '{} {}.hash.json'.format(os.path.basename(file), key[:12]))
+    source_stat = os.stat(file)
+
+    if os.path.exists(hash_file):
+        with open(hash_file) as hash_source:
+            metadata = json.load(hash_source)
+        if metadata['size'] == source_stat.st_size and metadata['mtime_ns'] == source_stat.st_mtime_ns:
+            return metadata['sha256']
+
+    metadata = {
+        'source': os.path.abspath(file),
+        'mtime_ns': source_stat.st_mtime_ns,
+        'size': source_stat.st_size,
+        'sha256': file_hash(file),
+    }
+    os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+    with open(hash_file, 'w') as hash_output:
+        json.dump(metadata, hash_output, indent=4)
+
+    return metadata['sha256']
+
+
+def cache_paths(file, parse):
+    """Returns the data and metadata paths of the cache entry for a source file and parser"""
+    parser_name = '{}.{}'.format(parse.__module__, parse.__qualname__)
+    key = hashlib.sha1('{}|{}'.format(os.path.abspath(file), parser_name).encode()).hexdigest()
+    base_path = os.path.join(CACHE_DIRECTORY, '{} {}'.format(os.path.basename(file), key[:12]))
+
+    return base_path + '.' + CACHE_FORMAT, base_path + '.json'
+
+
+def write_frame(data, file):
+    """Writes a parsed frame in the cache format, replacing any previous entry"""
+    temporary_file = file + '.tmp'
+    if CACHE_FORMAT == 'feather':
+        data.reset_index(drop=True).to_feather(temporary_file)
+    else:
+        data.to_pickle(temporary_file)
+    os.replace(temporary_file, file)
+
+
+def read_frame(file):
+    """Reads a parsed frame from the cache"""
+    if CACHE_FORMAT == 'feather':
+        return pd.read_feather(file)
+
+    return pd.read_pickle(file)
+
+
+def is_fresh(metadata, source_stat, file):
+    """Checks a cache entry still matches its source. Unchanged size and mtime skip hashing the source"""
+    if metadata.get('format') != CACHE_FORMAT or metadata['size'] != source_stat.st_size:
+        return False
+    if metadata['mtime_ns'] == source_stat.st_mtime_ns:
+        return True
+
+    # The file was touched, it is only stale if the contents changed
+    return metadata['sha256'] == source_hash(file)
+
+
+def read_cached(file, parse):
+    """Returns parse(file), loading it from the cache when the source file has not changed since it was last parsed"""
+    if not INPUT_CACHE_ENABLED:
+        return parse(file)
+
+    data_file, metadata_file = cache_paths(file, parse)
+    source_stat = os.stat(file)
+
+    if os.path.exists(data_file) and os.path.exists(metadata_file):
+        with open(metadata_file) as metadata_source:
+            metadata = json.load(metadata_source)
+
+        if is_fresh(metadata, source_stat, file):
+            if metadata['mtime_ns'] != source_stat.st_mtime_ns:
+                metadata['mtime_ns'] = source_stat.st_mtime_ns
+                with open(metadata_file, 'w') as metadata_output:
+                    json.dump(metadata, metadata_output, indent=4)
+
+            return read_frame(data_file)
+
+    # Missing or stale entry, parse the source and store it
+    data = parse(file)
+
+    os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+    write_frame(data, data_file)
+    metadata = {
+        'source': os.path.abspath(file),
+        'mtime_ns': source_stat.st_mtime_ns,
+        'size': source_stat.st_size,
+        'sha256': source_hash(file),
+        'format': CACHE_FORMAT,
+    }
+    with open(metadata_file, 'w') as metadata_output:
+        json.dump(metadata, metadata_output, indent=4)
+
+    return data
+
+
+def read_excel(file):
+    """Reads the first sheet of an Excel workbook through the cache"""
+    return read_cached(file, pd.read_excel)
+
+
+def clear_cache():
+    """Deletes every cached input frame"""
+    if not os.path.isdir(CACHE_DIRECTORY):
+        return
+
+    for cache_file in os.listdir(CACHE_DIRECTORY):
+        os.remove(os.path.join(CACHE_DIRECTORY, cache_file))
@@ -1,12 +1,22 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 
 from FestivalPower import Festival, Stage
+from input_cache import read_excel
+from profiling import profiled
+from checkpoints import LOAD_CHECKPOINT, write_checkpoint
+from output_backend import OUTPUT_FORMAT, write_output as write_output_file
+from year_calendar import YearCalendar, slots_per_day
+from energy_statistics import average_daily_energy as average_daily_energy_kwh
 
 RESIDENTIAL_HOMES = 400
+LOAD_TIME_STEP_MINUTES = 30
 SUMMER_END_DATE = '2023-04-15 00:00:00'
 
+# Household load profile of each season (time and power columns in the household load file), in date order
+HOUSEHOLD_SEASON_COLUMNS = [(0, 1), (3, 4)] # Summer, Winter
+SEASON_CHANGE_DATES = [SUMMER_END_DATE] # Date each season after the first starts
+
 # pd.set_option("display.max_colwidth", None)
 # pd.set_option("display.max_rows", None)
 
@@ -17,11 +27,11 @@ HOUSEHOLD_LOAD_FILE = 'Input Data/Household Load.xlsx'
 OUTPUT_LOAD_FILE = 'Output Data/Annual Load.xlsx'
 
 
-def rna_initialise_stages(festival):
+def rna_initialise_stages(festival, stage_set_times=None):
     """ Calculates estimated RNA load """
 
     # Load set times
-    stage_set_times = pd.read_excel(RNA_SET_TIMES_FILE)
+    stage_set_times = read_excel(RNA_SET_TIMES_FILE) if stage_set_times is None else stage_set_times
     alpine_area_set_times = stage_set_times.iloc[:, 0:2]
     sonarchy_set_times = stage_set_times.iloc[:, 3:5]
     log_cabin_set_times = stage_set_times.iloc[:, 6:8]
@@ -42,11 +52,12 @@ def rna_initialise_stages(festival):
     festival.add_stage(boom_box_stage)
     festival.add_stage(camp_stage)
 
-def model_rna_load():
+@profiled
+def model_rna_load(stage_set_times=None):
 
     rna_festival = Festival('RNA', ticketing_stands=4, food_stands=20, drink_stands=10, toilet_stands=5, campervan_outlets=40, lights=100)
 
-    rna_initialise_stages(rna_festival)
+    rna_initialise_stages(rna_festival, stage_set_times)
 
     rna_power = rna_festival.calculate_festival_power()
 
@@ -55,50 +66,72 @@ def model_rna_load():
     return rna_power
 
 
-def combine_cardrona_load(rna_power):
+def combine_cardrona_load(rna_power, cardrona=None):
 
-    cardrona = pd.read_excel(CARDRONA_LOAD_FILE)
+    cardrona = read_excel(CARDRONA_LOAD_FILE) if cardrona is None else cardrona.copy()
 
     cardrona.columns = ['datetime', 'KW']
     rna_power.columns = ['datetime', 'KW']
 
-    combined_power = cardrona.merge(rna_power, on='datetime', how='left')
+    # Place the festival schedule onto the load calendar by slot offset
+    calendar = YearCalendar(cardrona['datetime'].iloc[0], LOAD_TIME_STEP_MINUTES)
+    rna_kw = calendar.place(rna_power['datetime'], rna_power['KW'], fill=np.nan)
 
-    combined_power = combined_power.rename(columns={'KW_x': 'Cardrona KW'})
-    combined_power = combined_power.rename(columns={'KW_y': 'RNA KW'})
+    combined_power = cardrona.rename(columns={'KW': 'Cardrona KW'})
+    combined_power['RNA KW'] = rna_kw[calendar.slot_index(cardrona['datetime'])]
 
     return combined_power
 
-def model_residential_load():
+def household_profiles(household):
+    """Returns the half-hourly household power (W) of each season as a seasons x time of day slots array"""
+    profiles = np.full((len(HOUSEHOLD_SEASON_COLUMNS), slots_per_day(LOAD_TIME_STEP_MINUTES)), np.nan)
 
-    cardrona = pd.read_excel(CARDRONA_LOAD_FILE)
-    household = pd.read_excel(HOUSEHOLD_LOAD_FILE)
+    for season, (time_column, power_column) in enumerate(HOUSEHOLD_SEASON_COLUMNS):
+        profile = household.iloc[:, [time_column, power_column]].dropna()
+        time_of_day = pd.to_timedelta(profile.iloc[:, 0].astype(str))
+        profiles[season, time_of_day // pd.Timedelta(minutes=LOAD_TIME_STEP_MINUTES)] = profile.iloc[:, 1]
 
-    # Retrieve half-hourly household data, multiply by number of homes to supply, convert to kW
-    household_summer = pd.concat([household.iloc[:, 0], household.iloc[:, 1] * RESIDENTIAL_HOMES / 1000], axis=1) 
-    household_summer.columns = ['Time', 'KW']
-    household_winter = pd.concat([household.iloc[:, 3], household.iloc[:, 4] * RESIDENTIAL_HOMES / 1000], axis=1)
-    household_winter.columns = ['Time', 'KW']
+    return profiles
 
-    residential_load = cardrona.iloc[:, 0] # Retrieve datetime format for 1st column
-    
-    summer_end_datetime = pd.to_datetime(SUMMER_END_DATE) # Threshold for summer/winter household power change
+def residential_load_kw(datetimes, household, residential_homes):
+    """Builds residential load (kW) by indexing the household profiles with each datetime's season and time of day slot.
+    Pass a vector of home counts to get one column per count"""
+    datetimes = pd.DatetimeIndex(datetimes)
+    season = np.searchsorted(pd.DatetimeIndex(SEASON_CHANGE_DATES), datetimes, side='right')
+    time_of_day_slot = (datetimes.hour * 60 + datetimes.minute) // LOAD_TIME_STEP_MINUTES
 
-    # Filter times based on the datetime condition
-    cardrona['Datetime'] = pd.to_datetime(cardrona.iloc[:, 0])
-    summer_times = cardrona.loc[cardrona['Datetime'] < summer_end_datetime, 'Datetime']
-    winter_times = cardrona.loc[cardrona['Datetime'] >= summer_end_datetime, 'Datetime']
+    household_w = household_profiles(household)[season, time_of_day_slot]
 
-    # Merge based on the condition (datetime1 < threshold_datetime)
-    summer_load = pd.merge(summer_times, household_summer, left_on=summer_times.dt.time, right_on='Time', how='left')
-    winter_load = pd.merge(winter_times, household_winter, left_on=winter_times.dt.time, right_on='Time', how='left')
-    
-    residential_load = pd.concat([summer_load, winter_load], axis=0)
-    residential_load = residential_load.drop('Time', axis=1)
+    # Multiply by number of homes to supply, convert to kW
+    if np.ndim(residential_homes) == 0:
+        return household_w * residential_homes / 1000
+
+    return household_w[:, np.newaxis] * np.asarray(residential_homes)[np.newaxis, :] / 1000
+
+def residential_load_column(residential_homes):
+    """Returns the name of the residential load column for one home count in a home count sweep"""
+    return '{} Homes KW'.format(residential_homes)
+
+@profiled
+def model_residential_load(residential_homes=None, cardrona=None, household=None):
+    """Residential load for a number of homes (a KW column), or for a vector of home counts in one pass (one residential_load_column per count)"""
+    residential_homes = RESIDENTIAL_HOMES if residential_homes is None else residential_homes
+    cardrona = read_excel(CARDRONA_LOAD_FILE) if cardrona is None else cardrona
+    household = read_excel(HOUSEHOLD_LOAD_FILE) if household is None else household
+
+    datetimes = pd.to_datetime(cardrona.iloc[:, 0]) # Retrieve datetime format for 1st column
+    residential_kw = residential_load_kw(datetimes, household, residential_homes)
+    if np.ndim(residential_homes) == 0:
+        return pd.DataFrame({'Datetime': datetimes, 'KW': residential_kw})
+
+    residential_load = pd.DataFrame(residential_kw, columns=[residential_load_column(homes) for homes in residential_homes])
+    residential_load.insert(0, 'Datetime', datetimes.to_numpy())
 
     return residential_load
 
 def combine_residential_load(rna_and_cardrona_power, residential_load):
+    if residential_load.shape[1] != 2:
+        raise ValueError("Combine the residential load of one home count at a time, got {} load columns".format(residential_load.shape[1] - 1))
 
     residential_load.columns = ['datetime', 'KW']
 
@@ -111,6 +144,13 @@ def combine_residential_load(rna_and_cardrona_power, residential_load):
 
     return combined_power
 
+def get_total_load(load):
+    """Returns Total KW column of annual load dataframe"""
+
+    total_power = load[['datetime', 'Total KW']]
+
+    return total_power
+
 def display_results(total_power):
     
     # total_power.plot('datetime', 'Cardrona KW')
@@ -124,44 +164,33 @@ def display_results(total_power):
     print('Overall Peak Power: {:.2f} KW'.format(total_power['Total KW'].max()))
     # plt.show()
 
-def write_output(total_power):
-
-    total_power.to_excel(OUTPUT_LOAD_FILE, sheet_name='Sheet1')
+def write_output(total_power, output_format=OUTPUT_FORMAT):
+    """Writes the annual load, Excel only when asked for"""
+    return write_output_file(total_power, OUTPUT_LOAD_FILE, output_format)
 
 def calculate_average_daily_energy(load):
     """Calculates average energy consumption per day based on a years data"""
-    daily_energy_array = []
-    daily_energy_sum = 0
-    counter = 1
-    for index, row in load.iterrows():
-        load_half_hourly = row['Total KW']
-        daily_energy_sum += load_half_hourly * 0.5 
-        if counter == 48:
-            counter = 0
-            daily_energy_array.append(daily_energy_sum)
-            daily_energy_sum = 0
-        counter += 1
-
-    total_energy = 0
-    for i in range(len(daily_energy_array)):
-        total_energy += daily_energy_array[i]
-
-    average_daily_energy = (total_energy / len(daily_energy_array)) / 1000
+    average_daily_energy = average_daily_energy_kwh(load['datetime'], load['Total KW'])
     print("Daily energy consumption average: {:.2f} KWh".format(average_daily_energy))
 
-def calculate_annual_load():
+def calculate_annual_load(residential_homes=None, checkpoint=False):
+    """Calculates the annual load for one number of homes (RESIDENTIAL_HOMES by default)"""
+    residential_homes = RESIDENTIAL_HOMES if residential_homes is None else residential_homes
+    if np.ndim(residential_homes) != 0:
+        raise ValueError("calculate_annual_load models one home count, sweep home counts with model_residential_load or scenario_modelling")
 
     rna_power = model_rna_load()
 
     rna_and_cardrona_power = combine_cardrona_load(rna_power)
 
-    residential_load = model_residential_load()
+    residential_load = model_residential_load(residential_homes)
 
     total_power = combine_residential_load(rna_and_cardrona_power, residential_load)
 
     display_results(total_power)
 
-    # write_output(total_power)
+    if checkpoint:
+        write_checkpoint(total_power, LOAD_CHECKPOINT)
 
     return total_power
 
@@ -0,0 +1,153 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from generation_modelling import WIND_TURBINE_MODEL, WIND_TURBINE_QUANTITY, CUT_IN_SPEED_MS, CUT_OUT_SPEED_MS, WIND_TIME_STEP_MINUTES, ROUNDING_MODE, read_wind_data, read_power_curves, power_curve_arrays, interpolate_power_curve, generating_power
+from storage_and_grid_modelling import STORAGE_CAPACITY_KWH, STORAGE_CHARGE_EFFICIENCY, STORAGE_DISCHARGE_EFFICIENCY, TIME_STEP_HOURS, dispatch_storage_batch
+from year_calendar import YearCalendar, leap_year_slot, slots_per_day
+
+# Block bootstrap of historical wind: each block of the synthetic year is copied from a historical
+# block starting within WINDOW_DAYS of the same time of year, keeping calm spells intact
+MONTE_CARLO_YEARS = 1000
+BLOCK_DAYS = 7
+WINDOW_DAYS = 3
+YEARS_PER_TASK = 100 # Synthetic years generated and dispatched together in each worker task
+
+# Inputs shared with every worker process
+_worker_inputs = {}
+
+
+def historical_wind_speed(wind_data):
+    """Returns the historical wind speed (m/s) as a regular 15 minute series.
+    Missing readings and anomolies (zero readings) are filled with the mean for that time of year"""
+    wind_data = wind_data.set_index('Time')['Cardrona - Ridgeline Stn 15min: WindSpd_kph_mean[KPH]']
+    wind_data = wind_data[~wind_data.index.duplicated()]
+    calendar = YearCalendar(wind_data.index.min(), WIND_TIME_STEP_MINUTES, wind_data.index.max() + pd.Timedelta(minutes=WIND_TIME_STEP_MINUTES))
+
+    wind_speed_ms = calendar.place(wind_data.index, wind_data.to_numpy(dtype=float) / 3.6, fill=np.nan)
+    wind_speed_ms[wind_speed_ms == 0] = np.nan
+
+    # Fill gaps with the time of year mean
+    slot_keys = leap_year_slot(calendar.datetimes(), WIND_TIME_STEP_MINUTES)
+    recorded = ~np.isnan(wind_speed_ms)
+    slot_mean = np.bincount(slot_keys[recorded], weights=wind_speed_ms[recorded], minlength=366 * slots_per_day(WIND_TIME_STEP_MINUTES))
+    slot_mean /= np.maximum(np.bincount(slot_keys[recorded], minlength=len(slot_mean)), 1)
+    wind_speed_ms[~recorded] = slot_mean[slot_keys[~recorded]]
+
+    return slot_keys, wind_speed_ms
+
+
+def block_start_candidates(slot_keys, block_slots, target_keys, window_slots):
+    """Returns the historical positions each synthetic block may start from: within the window of the same time of year"""
+    year_slots = 366 * slots_per_day(WIND_TIME_STEP_MINUTES)
+    usable = np.arange(len(slot_keys) - block_slots + 1)
+
+    candidates = []
+    for target_key in target_keys:
+        distance = np.abs(slot_keys[usable] - target_key)
+        distance = np.minimum(distance, year_slots - distance) # Time of year wraps around
+        block_candidates = usable[distance <= window_slots]
+        if len(block_candidates) == 0:
+            raise ValueError("No historical wind data within {} slots of slot {}".format(window_slots, target_key))
+        candidates.append(block_candidates)
+
+    return candidates
+
+
+def sample_wind_years(slot_keys, wind_speed_ms, calendar, years, rng, block_days=BLOCK_DAYS, window_days=WINDOW_DAYS):
+    """Generates synthetic wind speed years (years, slots) on a 15 minute calendar by block bootstrap"""
+    block_slots = block_days * slots_per_day(WIND_TIME_STEP_MINUTES)
+    block_starts = np.arange(0, calendar.slots, block_slots)
+    target_keys = leap_year_slot(calendar.datetimes()[block_starts], WIND_TIME_STEP_MINUTES)
+    candidates = block_start_candidates(slot_keys, block_slots, target_keys, window_days * slots_per_day(WIND_TIME_STEP_MINUTES))
+
+    # Historical start of every block of every synthetic year, then gather each block's slots at once
+    historical_starts = np.column_stack([rng.choice(block_candidates, size=years) for block_candidates in candidates])
+    slot_in_block = np.arange(calendar.slots) - np.repeat(block_starts, block_slots)[:calendar.slots]
+    historical_index = np.repeat(historical_starts, block_slots, axis=1)[:, :calendar.slots] + slot_in_block
+
+    return wind_speed_ms[historical_index]
+
+
+def initialise_worker(inputs):
+    """Stores the shared inputs in the worker process"""
+    _worker_inputs.update(inputs)
+
+
+def simulate_wind_years_task(years, seed):
+    """Generates a batch of synthetic years, converts them to generation and dispatches storage for all of them together"""
+    inputs = _worker_inputs
+    rng = np.random.default_rng(seed)
+    wind_calendar = inputs['wind_calendar']
+    load_calendar = inputs['load_calendar']
+
+    wind_speed_ms = sample_wind_years(inputs['slot_keys'], inputs['wind_speed_ms'], wind_calendar, years, rng, inputs['block_days'], inputs['window_days'])
+
+    # Generation of every synthetic year, one column per year on the load calendar
+    power_output = interpolate_power_curve(wind_speed_ms, inputs['curve_wind_speeds'], inputs['curve_power_outputs'], inputs['rounding'])
+    generation_kw = generating_power(wind_speed_ms, inputs['cut_in_speed_ms'], inputs['cut_out_speed_ms']) * (power_output * inputs['turbine_quantity'])
+    generation_kw = load_calendar.resample(generation_kw.T, wind_calendar)
+
+    summary = dispatch_storage_batch(inputs['load_kw'], generation_kw, inputs['storage_capacity_kwh'], STORAGE_CHARGE_EFFICIENCY, STORAGE_DISCHARGE_EFFICIENCY)
+    summary['Annual Generation (KWH)'] = generation_kw.sum(axis=0) * TIME_STEP_HOURS
+    summary['Mean Wind Speed (m/s)'] = wind_speed_ms.mean(axis=1)
+
+    return pd.DataFrame(summary)
+
+
+def simulate_wind_years(load, years=MONTE_CARLO_YEARS, storage_capacity_kwh=STORAGE_CAPACITY_KWH, turbine_model=WIND_TURBINE_MODEL, turbine_quantity=WIND_TURBINE_QUANTITY,
+                        cut_in_speed_ms=CUT_IN_SPEED_MS, cut_out_speed_ms=CUT_OUT_SPEED_MS, block_days=BLOCK_DAYS, window_days=WINDOW_DAYS, rounding=ROUNDING_MODE, seed=None, max_workers=None):
+    """Runs synthetic wind years through the power curve and storage dispatch across a process pool, one result row per year"""
+    load_calendar = YearCalendar.from_datetimes(load['datetime'])
+    slot_keys, wind_speed_ms = historical_wind_speed(read_wind_data())
+    curve_wind_speeds, curve_power_outputs, turbine_models = power_curve_arrays(read_power_curves())
+
+    inputs = {
+        'slot_keys': slot_keys,
+        'wind_speed_ms': wind_speed_ms,
+        'wind_calendar': YearCalendar(load_calendar.start, WIND_TIME_STEP_MINUTES, load_calendar.end),
+        'load_calendar': load_calendar,
+        'load_kw': load['Total KW'].to_numpy(dtype=float),
+        'curve_wind_speeds': curve_wind_speeds,
+        'curve_power_outputs': curve_power_outputs[:, turbine_models.index(turbine_model)],
+        'turbine_quantity': turbine_quantity,
+        'cut_in_speed_ms': cut_in_speed_ms,
+        'cut_out_speed_ms': cut_out_speed_ms,
+        'rounding': rounding,
+        'storage_capacity_kwh': storage_capacity_kwh,
+        'block_days': block_days,
+        'window_days': window_days,
+    }
+
+    # Independent random streams for each task
+    task_years = [min(YEARS_PER_TASK, years - start) for start in range(0, years, YEARS_PER_TASK)]
+    task_seeds = np.random.SeedSequence(seed).spawn(len(task_years))
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=initialise_worker, initargs=(inputs,)) as executor:
+        results = list(executor.map(simulate_wind_years_task, task_years, task_seeds))
+
+    return pd.concat(results, ignore_index=True)
+
+
+def summarise_wind_years(results):
+    """Returns P50/P90 grid energy and the probability of a sustainable solution across synthetic years"""
+    return pd.Series({
+        'Years': len(results),
+        'P50 Grid Usage KWH': results['Grid Usage KWH'].quantile(0.5),
+        'P90 Grid Usage KWH': results['Grid Usage KWH'].quantile(0.9),
+        'P50 Grid Supply KWH': results['Grid Supply KWH'].quantile(0.5),
+        'P90 Grid Supply KWH': results['Grid Supply KWH'].quantile(0.9),
+        'Probability Sustainable': results['Sustainable'].mean(),
+    })
+
+
+if __name__ == "__main__":
+    from load_modelling import calculate_annual_load
+
+    print("-------------- Load Statistics ---------------")
+    annual_load = calculate_annual_load()[['datetime', 'Total KW']]
+
+    print("---------- Monte Carlo Wind Years ------------")
+    wind_year_results = simulate_wind_years(annual_load)
+    print(summarise_wind_years(wind_year_results).to_string(float_format='{:.2f}'.format))
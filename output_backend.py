@@ -0,0 +1,98 @@
+import os
+import uuid
+from urllib.parse import quote
+
+import pandas as pd
+
+try:
+    import pyarrow # Parquet and Feather need pyarrow, fall back to CSV without it
+except ImportError:
+    pyarrow = None
+
+# Output file formats and their extensions. Excel is slow to write, keep it for final deliverables
+OUTPUT_FORMATS = {'parquet': '.parquet', 'feather': '.feather', 'csv': '.csv', 'xlsx': '.xlsx'}
+OUTPUT_FORMAT = 'parquet' if pyarrow is not None else 'csv'
+
+# Scenario results appended to one dataset, one directory level per scenario parameter
+SCENARIO_DATASET_DIRECTORY = 'Output Data/Scenarios'
+
+
+def output_path(file, output_format=OUTPUT_FORMAT):
+    """Returns the output file path with the extension of the output format"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError("Unknown output format '{}', expected one of {}".format(output_format, list(OUTPUT_FORMATS)))
+
+    return os.path.splitext(file)[0] + OUTPUT_FORMATS[output_format]
+
+
+def write_output(data, file, output_format=OUTPUT_FORMAT):
+    """Writes a dataframe in the output format, returning the path written"""
+    file = output_path(file, output_format)
+
+    if output_format == 'xlsx':
+        data.to_excel(file, sheet_name='Sheet1')
+    elif output_format == 'parquet':
+        data.to_parquet(file, index=False)
+    elif output_format == 'feather':
+        data.reset_index(drop=True).to_feather(file)
+    else:
+        data.to_csv(file, index=False)
+
+    return file
+
+
+def read_output(file):
+    """Reads an output file back as a dataframe, choosing the reader from the extension"""
+    extension = os.path.splitext(file)[1]
+
+    if extension == '.xlsx':
+        return pd.read_excel(file, index_col=0)
+    if extension == '.parquet':
+        return pd.read_parquet(file)
+    if extension == '.feather':
+        return pd.read_feather(file)
+
+    return pd.read_csv(file)
+
+
+def quote_partition(value):
+    """Escapes a partition key or value for use in a directory name"""
+    return quote(str(value), safe=' ()')
+
+
+def partition_directory(directory, partition):
+    """Returns the directory of one partition, a 'parameter=value' level per scenario parameter"""
+    return os.path.join(directory, *['{}={}'.format(quote_partition(key), quote_partition(value)) for key, value in partition.items()])
+
+
+def append_partition(data, partition, directory=SCENARIO_DATASET_DIRECTORY, output_format=OUTPUT_FORMAT):
+    """Appends scenario results to the dataset under their partition, returning the path written.
+    The partition values are also kept as columns, so every file can be read on its own.
+    Each call writes a uniquely named part, so worker processes can append at the same time"""
+    data = data.copy()
+    for position, (key, value) in enumerate(partition.items()):
+        if key not in data.columns:
+            data.insert(position, key, value)
+
+    part_directory = partition_directory(directory, partition)
+    os.makedirs(part_directory, exist_ok=True)
+
+    return write_output(data, os.path.join(part_directory, 'part-{}'.format(uuid.uuid4().hex)), output_format)
+
+
+def read_dataset(directory=SCENARIO_DATASET_DIRECTORY, partition=None):
+    """Reads every part of a dataset, or only the parts matching some partition values, as one dataframe"""
+    partition = {} if partition is None else partition
+    wanted = {quote_partition(key): quote_partition(value) for key, value in partition.items()}
+
+    parts = []
+    for part_directory, _, files in os.walk(directory):
+        levels = dict(level.split('=', 1) for level in os.path.relpath(part_directory, directory).split(os.sep) if '=' in level)
+        if any(levels.get(key) != value for key, value in wanted.items()):
+            continue
+        parts.extend(read_output(os.path.join(part_directory, file)) for file in sorted(files) if os.path.splitext(file)[1] in OUTPUT_FORMATS.values())
+
+    if not parts:
+        raise FileNotFoundError("No dataset parts in '{}' matching {}".format(directory, partition))
+
+    return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,292 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+
+from FestivalPower import Festival, Stage
+from input_cache import source_hash, read_cached, read_excel
+from load_modelling import RESIDENTIAL_HOMES, RNA_SET_TIMES_FILE, CARDRONA_LOAD_FILE, HOUSEHOLD_LOAD_FILE, model_rna_load, rna_initialise_stages, combine_cardrona_load, model_residential_load, residential_load_kw, household_profiles, combine_residential_load, get_total_load, display_results as display_load_results, calculate_average_daily_energy
+from generation_modelling import WIND_DATA_FILE, POWER_CURVE_DATA_FILE, WIND_TURBINE_MODEL, WIND_TURBINE_QUANTITY, CUT_IN_SPEED_MS, CUT_OUT_SPEED_MS, ROUNDING_MODE, parse_wind_data, process_wind_data, read_power_curve, model_generation, interpolate_power_curve, reorder_generation, display_results as display_generation_results
+from storage_and_grid_modelling import STORAGE_CAPACITY_KWH, STORAGE_CHARGE_EFFICIENCY, STORAGE_DISCHARGE_EFFICIENCY, STORAGE_MAX_CHARGE_KW, STORAGE_MAX_DISCHARGE_KW, STORAGE_SELF_DISCHARGE_PER_HOUR, STORAGE_MIN_SOC, STORAGE_MAX_SOC, STORAGE_CAPACITY_FADE_PER_CYCLE, align_generation, dispatch_storage, StorageResult
+from solar_modelling import SOLAR_DATA_FILE, PV_CAPACITY_KWP, parse_solar_data, process_solar_data, add_solar_generation, pv_power_kw
+from storage_report import report_storage_and_grid_usage
+from output_backend import OUTPUT_FORMAT
+from profiling import profile_call
+
+# Memoized stage results, keyed on the stage code, its parameters and the hashes of its upstream results. Only the latest key of each stage is kept
+PIPELINE_DIRECTORY = 'Output Data/Pipeline'
+
+
+class PipelineStage:
+    """One step of the pipeline: function(*upstream results, **parameters).
+    The source of the function and of the listed code is part of the stage key, other code and
+    module constants that are not parameters are not tracked (run clear_pipeline after changing them)"""
+
+    def __init__(self, name, function, upstream=(), parameters=None, code=(), cache=True):
+        self.name = name
+        self.function = function
+        self.upstream = tuple(upstream)
+        self.parameters = {} if parameters is None else dict(parameters)
+        self.code = (function,) + tuple(code)
+        self.cache = cache # Uncached stages (input files, reports) run whenever a result needs them
+
+    def key(self, upstream_hashes):
+        """Returns the hash identifying this stage's result"""
+        stage_digest = hashlib.sha256()
+        stage_digest.update(json.dumps({
+            'name': self.name,
+            'code': [inspect.getsource(code) for code in self.code],
+            'parameters': self.parameters,
+            'upstream': upstream_hashes,
+        }, sort_keys=True, default=str).encode())
+
+        return stage_digest.hexdigest()
+
+
+class Pipeline:
+    """Dependency graph of stages, run in the order they were added. A stage whose key is unchanged
+    reuses its stored result, and a stage that reruns to the same result leaves the stages after it unchanged"""
+
+    def __init__(self, stages):
+        self.stages = {}
+        for stage in stages:
+            missing = [name for name in stage.upstream if name not in self.stages]
+            if missing:
+                raise ValueError("Stage '{}' depends on {} which must be added before it".format(stage.name, missing))
+            self.stages[stage.name] = stage
+
+        self.executed = [] # Stages run by the last run
+
+    def required_stages(self, targets):
+        """Returns the target stages and every stage upstream of them, in run order"""
+        required = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError("Unknown stage '{}', expected one of {}".format(name, list(self.stages)))
+            if name not in required:
+                required.add(name)
+                pending.extend(self.stages[name].upstream)
+
+        return [name for name in self.stages if name in required]
+
+    def run(self, targets):
+        """Returns the result of each target stage, only running stages whose key has changed"""
+        keys = {}
+        hashes = {}
+        results = {}
+        self.executed = []
+
+        def result(name):
+            if name not in results:
+                stage = self.stages[name]
+                if stage.cache:
+                    results[name] = read_stage_result(name, keys[name])
+                else:
+                    results[name] = execute(stage)
+
+            return results[name]
+
+        def execute(stage):
+            stage_result = profile_call('pipeline.' + stage.name, stage.function, *[result(name) for name in stage.upstream], **stage.parameters)
+            self.executed.append(stage.name)
+
+            return stage_result
+
+        for name in self.required_stages(targets):
+            stage = self.stages[name]
+            keys[name] = stage.key([hashes[upstream] for upstream in stage.upstream])
+
+            if not stage.cache:
+                hashes[name] = keys[name]
+                continue
+
+            metadata = read_stage_metadata(name, keys[name])
+            if metadata is None:
+                results[name] = execute(stage)
+                metadata = write_stage_result(name, keys[name], results[name], stage.parameters)
+            hashes[name] = metadata['result_hash']
+
+        return {name: result(name) for name in targets}
+
+
+def stage_paths(name, key):
+    """Returns the result and metadata paths of a stage key"""
+    base_path = os.path.join(PIPELINE_DIRECTORY, '{} {}'.format(name, key[:16]))
+
+    return base_path + '.pickle', base_path + '.json'
+
+
+def read_stage_metadata(name, key):
+    """Returns the metadata of a stored stage result, or None if the stage has not run with this key"""
+    result_file, metadata_file = stage_paths(name, key)
+    if not (os.path.exists(result_file) and os.path.exists(metadata_file)):
+        return None
+
+    with open(metadata_file) as metadata_source:
+        metadata = json.load(metadata_source)
+
+    return metadata if metadata['key'] == key else None
+
+
+def read_stage_result(name, key):
+    """Reads a stored stage result"""
+    with open(stage_paths(name, key)[0], 'rb') as result_source:
+        return pickle.load(result_source)
+
+
+def write_stage_result(name, key, stage_result, parameters):
+    """Stores a stage result, returning its metadata with the hash of the result"""
+    result_file, metadata_file = stage_paths(name, key)
+    result_bytes = pickle.dumps(stage_result, protocol=pickle.HIGHEST_PROTOCOL)
+    metadata = {
+        'stage': name,
+        'key': key,
+        'result_hash': hashlib.sha256(result_bytes).hexdigest(),
+        'parameters': parameters,
+    }
+
+    os.makedirs(PIPELINE_DIRECTORY, exist_ok=True)
+    with open(result_file + '.tmp', 'wb') as result_output:
+        result_output.write(result_bytes)
+    os.replace(result_file + '.tmp', result_file)
+    with open(metadata_file, 'w') as metadata_output:
+        json.dump(metadata, metadata_output, indent=4, default=str)
+    remove_stage_results(name, keep=(result_file, metadata_file))
+
+    return metadata
+
+
+def remove_stage_results(name, keep=()):
+    """Deletes the stored results of a stage other than the kept files, so only its latest key stays on disk"""
+    keep = {os.path.basename(kept_file) for kept_file in keep}
+    for stage_file in os.listdir(PIPELINE_DIRECTORY):
+        if stage_file.rsplit(' ', 1)[0] == name and stage_file not in keep:
+            os.remove(os.path.join(PIPELINE_DIRECTORY, stage_file))
+
+
+def clear_pipeline():
+    """Deletes every stored stage result. Each stage only keeps its latest key, so going back to
+    earlier parameters reruns the stages they change"""
+    if not os.path.isdir(PIPELINE_DIRECTORY):
+        return
+
+    for stage_file in os.listdir(PIPELINE_DIRECTORY):
+        os.remove(os.path.join(PIPELINE_DIRECTORY, stage_file))
+
+
+# ------------------------- Stages ---------------------------
+
+# Input stages read through the input cache, their source hash parameter only keys them on the file contents
+def excel_input(file, source_hash):
+    return read_excel(file)
+
+
+def wind_input(file, source_hash):
+    return read_cached(file, parse_wind_data)
+
+
+def festival_load(rna_set_times):
+    return model_rna_load(rna_set_times)
+
+
+def residential_load(cardrona, household, residential_homes):
+    return model_residential_load(residential_homes, cardrona, household)
+
+
+def combined_load(festival_power, cardrona, residential_power):
+    return combine_residential_load(combine_cardrona_load(festival_power.copy(), cardrona), residential_power.copy())
+
+
+def solar_input(file, source_hash):
+    return read_cached(file, parse_solar_data)
+
+
+def wind_climatology(wind_data):
+    return process_wind_data(wind_data=wind_data)
+
+
+def solar_climatology(solar_data):
+    return process_solar_data(solar_data)
+
+
+def generation(wind_data, power_curves, solar_data=None, *, turbine_model, turbine_quantity, cut_in_speed_ms, cut_out_speed_ms, rounding, pv_capacity_kwp):
+    """Wind generation, plus solar PV generation when the solar climatology is upstream"""
+    wind_generation = model_generation(wind_data.reset_index(), read_power_curve(turbine_model, power_curves), turbine_quantity, cut_in_speed_ms, cut_out_speed_ms, rounding)
+    if solar_data is None:
+        return wind_generation
+
+    return add_solar_generation(wind_generation, solar_data, pv_capacity_kwp)
+
+
+def alignment(load, annual_generation):
+    """Total load with the generation of each of its datetimes on the modelled year"""
+    annual_load = get_total_load(load)
+    annual_generation = reorder_generation(annual_generation, annual_load['datetime'].iloc[0])
+
+    return annual_load.assign(**{'Generation KW': align_generation(annual_load, annual_generation)})
+
+
+def dispatch(aligned, capacity_kwh, charge_efficiency, discharge_efficiency, max_charge_kw, max_discharge_kw, self_discharge_per_hour, min_soc, max_soc, capacity_fade_per_cycle):
+    storage_dispatch = dispatch_storage(aligned['Total KW'], aligned['Generation KW'], capacity_kwh, charge_efficiency, discharge_efficiency, max_charge_kw=max_charge_kw, max_discharge_kw=max_discharge_kw,
+                                        self_discharge_per_hour=self_discharge_per_hour, min_soc=min_soc, max_soc=max_soc, capacity_fade_per_cycle=capacity_fade_per_cycle)
+
+    return StorageResult(aligned['datetime'], storage_dispatch, capacity_kwh)
+
+
+def reports(load, wind_data, storage_result, turbine_model, turbine_quantity, cut_in_speed_ms, cut_out_speed_ms, plot, export, output_format):
+    """Prints the results of every stage, optionally plotting and writing the storage and grid usage"""
+    print("-------------- Load Statistics ---------------")
+    display_load_results(load)
+    calculate_average_daily_energy(get_total_load(load))
+
+    print("----------- Generation Statistics ------------")
+    display_generation_results(wind_data.reset_index(), turbine_model, turbine_quantity, cut_in_speed_ms, cut_out_speed_ms)
+
+    print("-------------- Energy Storage ----------------")
+    report_storage_and_grid_usage(storage_result, plot=plot, export=export, output_format=output_format)
+
+
+def build_pipeline(residential_homes=RESIDENTIAL_HOMES, turbine_model=WIND_TURBINE_MODEL, turbine_quantity=WIND_TURBINE_QUANTITY, cut_in_speed_ms=CUT_IN_SPEED_MS,
+                   cut_out_speed_ms=CUT_OUT_SPEED_MS, rounding=ROUNDING_MODE, pv_capacity_kwp=PV_CAPACITY_KWP, capacity_kwh=STORAGE_CAPACITY_KWH,
+                   charge_efficiency=STORAGE_CHARGE_EFFICIENCY, discharge_efficiency=STORAGE_DISCHARGE_EFFICIENCY, max_charge_kw=STORAGE_MAX_CHARGE_KW,
+                   max_discharge_kw=STORAGE_MAX_DISCHARGE_KW, self_discharge_per_hour=STORAGE_SELF_DISCHARGE_PER_HOUR, min_soc=STORAGE_MIN_SOC, max_soc=STORAGE_MAX_SOC,
+                   capacity_fade_per_cycle=STORAGE_CAPACITY_FADE_PER_CYCLE, plot=False, export=False,
+                   output_format=OUTPUT_FORMAT):
+    """Builds the load, generation and storage pipeline for one set of design parameters. The reports only plot and write files when asked.
+    The solar data is only read when there is PV"""
+    turbine = {'turbine_model': turbine_model, 'turbine_quantity': turbine_quantity, 'cut_in_speed_ms': cut_in_speed_ms, 'cut_out_speed_ms': cut_out_speed_ms}
+    storage = {'capacity_kwh': capacity_kwh, 'charge_efficiency': charge_efficiency, 'discharge_efficiency': discharge_efficiency, 'max_charge_kw': max_charge_kw,
+               'max_discharge_kw': max_discharge_kw, 'self_discharge_per_hour': self_discharge_per_hour, 'min_soc': min_soc, 'max_soc': max_soc,
+               'capacity_fade_per_cycle': capacity_fade_per_cycle}
+
+    def input_stage(name, read, file, code=()):
+        return PipelineStage(name, read, parameters={'file': file, 'source_hash': source_hash(file)}, code=code, cache=False)
+
+    # Solar stages only exist with PV, so wind-only runs need no solar data file
+    solar_stages = []
+    if pv_capacity_kwp > 0:
+        solar_stages = [input_stage('solar_data', solar_input, SOLAR_DATA_FILE, code=(parse_solar_data,)),
+                        PipelineStage('solar_climatology', solar_climatology, ['solar_data'], code=(process_solar_data,))]
+
+    return Pipeline([
+        input_stage('rna_set_times', excel_input, RNA_SET_TIMES_FILE),
+        input_stage('cardrona_load', excel_input, CARDRONA_LOAD_FILE),
+        input_stage('household_load', excel_input, HOUSEHOLD_LOAD_FILE),
+        input_stage('wind_data', wind_input, WIND_DATA_FILE, code=(parse_wind_data,)),
+        input_stage('power_curves', excel_input, POWER_CURVE_DATA_FILE),
+        PipelineStage('festival_load', festival_load, ['rna_set_times'], code=(model_rna_load, rna_initialise_stages, Festival, Stage)),
+        PipelineStage('residential_load', residential_load, ['cardrona_load', 'household_load'], {'residential_homes': residential_homes},
+                      code=(model_residential_load, residential_load_kw, household_profiles)),
+        PipelineStage('combined_load', combined_load, ['festival_load', 'cardrona_load', 'residential_load'], code=(combine_cardrona_load, combine_residential_load)),
+        PipelineStage('wind_climatology', wind_climatology, ['wind_data'], code=(process_wind_data,)),
+        *solar_stages,
+        PipelineStage('generation', generation, ['wind_climatology', 'power_curves'] + [stage.name for stage in solar_stages[1:]], dict(turbine, rounding=rounding, pv_capacity_kwp=pv_capacity_kwp),
+                      code=(read_power_curve, model_generation, interpolate_power_curve, add_solar_generation, pv_power_kw)),
+        PipelineStage('alignment', alignment, ['combined_load', 'generation'], code=(get_total_load, reorder_generation, align_generation)),
+        PipelineStage('dispatch', dispatch, ['alignment'], storage, code=(dispatch_storage, StorageResult)),
+        PipelineStage('reports', reports, ['combined_load', 'wind_climatology', 'dispatch'], dict(turbine, plot=plot, export=export, output_format=output_format),
+                      code=(report_storage_and_grid_usage,), cache=False),
+    ])
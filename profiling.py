@@ -0,0 +1,164 @@
+import functools
+import glob
+import json
+import os
+import time
+import tracemalloc
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# Opt-in timing and memory probes. Tracing memory slows Python-heavy code down, so profiles are off by default
+PROFILING_ENABLED = False
+PROFILE_MEMORY = True # Tracing memory slows loops over many small arrays (the batch dispatch) several times, turn off for timings only
+PROFILE_DIRECTORY = 'Output Data/Profiles'
+PROFILE_COLUMNS = ['Name', 'Depth', 'Process', 'Time (s)', 'Rows', 'Peak Memory (MB)']
+
+_records = [] # Probes recorded by this process since the last flush
+_peak_stack = [] # Peak traced memory (bytes) of each probe still running, outermost first
+
+
+def enable_profiling(enabled=True):
+    """Turns the probes on or off for this process"""
+    global PROFILING_ENABLED
+    PROFILING_ENABLED = enabled
+
+
+def row_count(result):
+    """Returns the number of rows in a result, or None when it has no rows (reports, scalars)"""
+    if isinstance(result, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(result)
+    if hasattr(result, 'datetimes'): # StorageResult
+        return len(result.datetimes)
+
+    return None
+
+
+def record(name, depth, seconds, result, peak_memory_mb):
+    """Adds one probe to this process's records"""
+    _records.append({
+        'Name': name,
+        'Depth': depth,
+        'Process': os.getpid(),
+        'Time (s)': seconds,
+        'Rows': row_count(result),
+        'Peak Memory (MB)': peak_memory_mb,
+    })
+
+
+def profile_call(name, function, *args, **kwargs):
+    """Calls function, recording its wall time, rows returned and peak traced memory under name when profiling is on.
+    Probes can be nested, the peak memory of a probe includes the probes it calls"""
+    if not PROFILING_ENABLED:
+        return function(*args, **kwargs)
+    if not PROFILE_MEMORY:
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        record(name, len(_peak_stack), time.perf_counter() - start, result, None)
+        return result
+
+    owner = not tracemalloc.is_tracing()
+    if owner:
+        tracemalloc.start()
+    elif _peak_stack:
+        _peak_stack[-1] = max(_peak_stack[-1], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    depth = len(_peak_stack)
+    _peak_stack.append(0)
+
+    start = time.perf_counter()
+    try:
+        result = function(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        peak_memory = max(_peak_stack.pop(), tracemalloc.get_traced_memory()[1])
+        if owner:
+            tracemalloc.stop()
+        elif _peak_stack:
+            _peak_stack[-1] = max(_peak_stack[-1], peak_memory)
+
+    record(name, depth, seconds, result, (peak_memory - start_memory) / 2 ** 20)
+
+    return result
+
+
+def profiled(function):
+    """Decorator adding a probe to a function, named after its module and function name"""
+    name = '{}.{}'.format(function.__module__, function.__qualname__)
+
+    @functools.wraps(function)
+    def probe(*args, **kwargs):
+        return profile_call(name, function, *args, **kwargs)
+
+    return probe
+
+
+def profile_records(clear=False):
+    """Returns the probes recorded by this process as a dataframe, in the order they finished"""
+    records = pd.DataFrame(_records, columns=PROFILE_COLUMNS)
+    if clear:
+        _records.clear()
+
+    return records
+
+
+def run_profile_directory(directory=PROFILE_DIRECTORY):
+    """Returns a new directory for the profile of one run"""
+    return os.path.join(directory, time.strftime('%Y-%m-%d %H-%M-%S'))
+
+
+def json_records(data):
+    """Returns the rows of a dataframe as JSON-ready dicts, missing values as null"""
+    return data.astype(object).where(data.notna(), None).to_dict(orient='records')
+
+
+def flush_profile(run_directory):
+    """Writes this process's probes as a part of the run profile and clears them, so worker processes can add to the same run"""
+    os.makedirs(run_directory, exist_ok=True)
+    part_file = os.path.join(run_directory, 'part-{}.json'.format(uuid.uuid4().hex))
+    with open(part_file, 'w') as part_output:
+        json.dump(json_records(profile_records(clear=True)), part_output)
+
+    return part_file
+
+
+def summarise_profile(records):
+    """Totals the probes of each name across calls and processes"""
+    summary = records.groupby('Name', sort=False).agg(**{
+        'Calls': ('Time (s)', 'size'),
+        'Processes': ('Process', 'nunique'),
+        'Total Time (s)': ('Time (s)', 'sum'),
+        'Mean Time (s)': ('Time (s)', 'mean'),
+        'Max Time (s)': ('Time (s)', 'max'),
+        'Rows': ('Rows', lambda rows: rows.sum(min_count=1)),
+        'Peak Memory (MB)': ('Peak Memory (MB)', 'max'),
+    })
+    summary['Throughput (rows/s)'] = summary['Rows'] / summary['Total Time (s)']
+
+    return summary.sort_values('Total Time (s)', ascending=False).reset_index()
+
+
+def write_profile(run_directory):
+    """Combines the probes of this process and every worker part into the run profile.
+    Writes every probe (Profile.json, Profile.csv) and the totals per name (Profile Summary.csv), returning the totals"""
+    flush_profile(run_directory)
+
+    part_files = sorted(glob.glob(os.path.join(run_directory, 'part-*.json')))
+    parts = []
+    for part_file in part_files:
+        with open(part_file) as part_source:
+            parts.extend(json.load(part_source))
+    records = pd.DataFrame(parts, columns=PROFILE_COLUMNS)
+    summary = summarise_profile(records)
+
+    with open(os.path.join(run_directory, 'Profile.json'), 'w') as profile_output:
+        json.dump({'records': json_records(records), 'summary': json_records(summary)}, profile_output, indent=4)
+    records.to_csv(os.path.join(run_directory, 'Profile.csv'), index=False)
+    summary.to_csv(os.path.join(run_directory, 'Profile Summary.csv'), index=False)
+
+    for part_file in part_files:
+        os.remove(part_file)
+
+    return summary
@@ -0,0 +1,161 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from input_cache import read_excel
+from output_backend import OUTPUT_FORMAT, SCENARIO_DATASET_DIRECTORY, append_partition
+from cost_modelling import TURBINE_CAPEX_PER_KW, STORAGE_CAPEX_PER_KWH, TURBINE_LIFETIME_YEARS, STORAGE_LIFETIME_YEARS, GRID_COST_COLUMNS, TariffSchedule, design_costs
+from profiling import PROFILING_ENABLED, enable_profiling, profiled, profile_records, flush_profile, run_profile_directory, write_profile
+from load_modelling import CARDRONA_LOAD_FILE, HOUSEHOLD_LOAD_FILE, RESIDENTIAL_HOMES, model_rna_load, combine_cardrona_load, model_residential_load, residential_load_column, combine_residential_load, get_total_load
+from generation_modelling import CUT_IN_SPEED_MS, process_wind_data, read_power_curves, read_power_curve, model_generation, reorder_generation
+from storage_and_grid_modelling import STORAGE_CHARGE_EFFICIENCY, STORAGE_DISCHARGE_EFFICIENCY, TIME_STEP_HOURS, align_generation, dispatch_storage_batch
+
+# --------------------- Design study grid --------------------
+TURBINE_MODELS = ['V90-2.0MW', 'V150-4.2MW']
+TURBINE_QUANTITIES = [1, 2, 3]
+CUT_IN_SPEEDS_MS = [CUT_IN_SPEED_MS]
+CUT_OUT_SPEEDS_MS = [23, 25]
+STORAGE_CAPACITIES_KWH = [0, 500, 1000, 2000, 5000]
+RESIDENTIAL_HOMES_COUNTS = [RESIDENTIAL_HOMES]
+RANK_BY_COST = False # Rank by NPV rather than sustainability and grid energy
+
+SCENARIO_COLUMNS = ['Turbine Model', 'Turbine Quantity', 'Cut-in Speed (m/s)', 'Cut-out Speed (m/s)', 'Residential Homes']
+
+# Inputs parsed once and shared with every worker process
+_worker_inputs = {}
+_worker_generation = {}
+
+
+def read_scenario_inputs(residential_homes=RESIDENTIAL_HOMES_COUNTS):
+    """Parses the load, wind and power curve inputs shared by every scenario.
+    The annual load of every home count is built here, with the residential load of all counts modelled in one pass"""
+    cardrona = read_excel(CARDRONA_LOAD_FILE)
+    rna_and_cardrona_power = combine_cardrona_load(model_rna_load(), cardrona)
+
+    residential_homes = list(dict.fromkeys(residential_homes))
+    residential_load = model_residential_load(residential_homes, cardrona, read_excel(HOUSEHOLD_LOAD_FILE))
+    loads = {homes: get_total_load(combine_residential_load(rna_and_cardrona_power, residential_load[['Datetime', residential_load_column(homes)]]))
+             for homes in residential_homes}
+
+    return {
+        'loads': loads,
+        'wind_data': process_wind_data().reset_index(),
+        'power_curves': read_power_curves(),
+    }
+
+
+def initialise_worker(inputs, profile_directory=None):
+    """Stores the shared inputs in the worker process, turning profiling on when there is a run profile to add to"""
+    _worker_inputs.update(inputs)
+    _worker_inputs['profile_directory'] = profile_directory
+    enable_profiling(profile_directory is not None)
+    profile_records(clear=True) # Forked workers start with the parent's probes, which the parent writes itself
+    _worker_generation.clear()
+
+
+def build_scenarios(turbine_models, turbine_quantities, cut_in_speeds_ms, cut_out_speeds_ms, residential_homes):
+    """Returns every combination of the design parameters as a list of scenarios"""
+    return [dict(zip(SCENARIO_COLUMNS, values)) for values in itertools.product(turbine_models, turbine_quantities, cut_in_speeds_ms, cut_out_speeds_ms, residential_homes)]
+
+
+def scenario_load(residential_homes):
+    """Returns the annual load for a number of homes, built once for every home count with the shared inputs"""
+    return _worker_inputs['loads'][residential_homes]
+
+
+def scenario_generation(turbine_model, turbine_quantity, cut_in_speed_ms, cut_out_speed_ms, year_start):
+    """Returns the annual generation for a turbine design on the calendar of the year starting at year_start (the start of the load),
+    reused across scenarios in this worker"""
+    key = (turbine_model, turbine_quantity, cut_in_speed_ms, cut_out_speed_ms, pd.Timestamp(year_start))
+    if key not in _worker_generation:
+        power_curve = read_power_curve(turbine_model, _worker_inputs['power_curves'])
+        generation = model_generation(_worker_inputs['wind_data'], power_curve, turbine_quantity, cut_in_speed_ms, cut_out_speed_ms)
+        _worker_generation[key] = reorder_generation(generation, year_start)
+
+    return _worker_generation[key]
+
+
+@profiled
+def evaluate_scenario(scenario, storage_capacities_kwh, dataset_directory=None, output_format=OUTPUT_FORMAT):
+    """Runs one turbine and load design against every storage capacity, costing each one under the tariff as it dispatches.
+    Optionally appends the rows to the scenario dataset"""
+    load = scenario_load(scenario['Residential Homes'])
+    generation = scenario_generation(scenario['Turbine Model'], scenario['Turbine Quantity'], scenario['Cut-in Speed (m/s)'], scenario['Cut-out Speed (m/s)'],
+                                     load['datetime'].iloc[0])
+
+    load_kw = load['Total KW'].to_numpy(dtype=float)
+    generation_kw = align_generation(load, generation)
+    tariff = TariffSchedule(load.iloc[:, 0])
+
+    dispatch = dispatch_storage_batch(load_kw, generation_kw, storage_capacities_kwh, STORAGE_CHARGE_EFFICIENCY, STORAGE_DISCHARGE_EFFICIENCY, tariff=tariff)
+    grid_cost = {column: dispatch.pop(column) for column in GRID_COST_COLUMNS}
+    summary = pd.DataFrame(dispatch)
+    for position, column in enumerate(SCENARIO_COLUMNS):
+        summary.insert(position, column, scenario[column])
+    summary['Annual Generation (KWH)'] = np.sum(generation_kw) * TIME_STEP_HOURS
+    summary['Annual Load (KWH)'] = np.sum(load_kw) * TIME_STEP_HOURS
+
+    turbine_rating_kw = max(read_power_curve(scenario['Turbine Model'], _worker_inputs['power_curves']).values())
+    capex = [scenario['Turbine Quantity'] * turbine_rating_kw * TURBINE_CAPEX_PER_KW, summary['Storage Capacity (KWH)'] * STORAGE_CAPEX_PER_KWH]
+    for column, values in design_costs(grid_cost, capex, [TURBINE_LIFETIME_YEARS, STORAGE_LIFETIME_YEARS], load_kw, tariff, TIME_STEP_HOURS, STORAGE_DISCHARGE_EFFICIENCY).items():
+        summary[column] = values
+
+    if dataset_directory is not None:
+        append_partition(summary, scenario, dataset_directory, output_format)
+
+    return summary
+
+
+def scenario_task(scenario, storage_capacities_kwh, dataset_directory=None, output_format=OUTPUT_FORMAT):
+    """Evaluates one scenario in a worker process, adding the worker's probes to the run profile"""
+    summary = evaluate_scenario(scenario, storage_capacities_kwh, dataset_directory, output_format)
+
+    if _worker_inputs.get('profile_directory') is not None:
+        flush_profile(_worker_inputs['profile_directory'])
+
+    return summary
+
+
+def rank_scenarios(results, by_cost=RANK_BY_COST):
+    """Ranks sustainable designs with storage first, then by least grid energy required and smallest storage. By cost, ranks by highest NPV.
+    Without storage there is nothing to run down, so those designs are only ranked by their grid energy"""
+    if by_cost:
+        ranked = results.sort_values(['NPV ($)', 'Storage Capacity (KWH)', 'Turbine Quantity'], ascending=[False, True, True], kind='stable')
+    else:
+        sustainable_storage = results['Sustainable'] & (results['Storage Capacity (KWH)'] > 0)
+        ranked = results.assign(**{'Sustainable Storage': sustainable_storage})
+        ranked = ranked.sort_values(['Sustainable Storage', 'Grid Usage KWH', 'Storage Capacity (KWH)', 'Turbine Quantity'], ascending=[False, True, True, True], kind='stable')
+        ranked = ranked.drop(columns='Sustainable Storage')
+    ranked = ranked.reset_index(drop=True)
+    ranked.insert(0, 'Rank', np.arange(1, len(ranked) + 1))
+
+    return ranked
+
+
+def run_scenarios(turbine_models=TURBINE_MODELS, turbine_quantities=TURBINE_QUANTITIES, cut_in_speeds_ms=CUT_IN_SPEEDS_MS, cut_out_speeds_ms=CUT_OUT_SPEEDS_MS,
+                  storage_capacities_kwh=STORAGE_CAPACITIES_KWH, residential_homes=RESIDENTIAL_HOMES_COUNTS, max_workers=None, dataset_directory=None, output_format=OUTPUT_FORMAT,
+                  profile_directory=None, rank_by_cost=RANK_BY_COST):
+    """Evaluates every design in the grid across a process pool and returns one ranked table.
+    With a dataset directory every scenario's results are also appended to one dataset partitioned by the design parameters.
+    With a profile directory, the probes of this process and every worker are combined into one run profile there"""
+    scenarios = build_scenarios(turbine_models, turbine_quantities, cut_in_speeds_ms, cut_out_speeds_ms, residential_homes)
+    if profile_directory is not None:
+        enable_profiling()
+    inputs = read_scenario_inputs(residential_homes)
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=initialise_worker, initargs=(inputs, profile_directory)) as executor:
+        results = list(executor.map(scenario_task, scenarios, itertools.repeat(storage_capacities_kwh), itertools.repeat(dataset_directory), itertools.repeat(output_format)))
+
+    if profile_directory is not None:
+        write_profile(profile_directory)
+
+    return rank_scenarios(pd.concat(results, ignore_index=True), rank_by_cost)
+
+
+if __name__ == "__main__":
+
+    print("------------- Scenario Ranking ---------------")
+    ranked_scenarios = run_scenarios(dataset_directory=SCENARIO_DATASET_DIRECTORY, profile_directory=run_profile_directory() if PROFILING_ENABLED else None)
+    print(ranked_scenarios.head(20).to_string(index=False))
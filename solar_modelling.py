@@ -0,0 +1,78 @@
+import pandas as pd
+import numpy as np
+
+from input_cache import read_cached
+from year_calendar import slots_per_day, leap_year_slot, leap_year_slot_labels, month_date_time_slot
+
+#Input files
+SOLAR_DATA_FILE = 'Input Data/Solar Cardrona.csv'
+SOLAR_TIME_COLUMN = 'Time'
+IRRADIANCE_COLUMN = 'Irradiance (W/m2)' # In the plane of the panels (global horizontal for flat panels)
+AIR_TEMPERATURE_COLUMN = 'Air Temperature (C)'
+
+# Solar data is averaged onto the same leap-year slots as the wind data
+SOLAR_TIME_STEP_MINUTES = 15
+SOLAR_SLOTS_PER_DAY = slots_per_day(SOLAR_TIME_STEP_MINUTES)
+
+# PV array, set the capacity above 0 to add solar to the wind generation
+PV_CAPACITY_KWP = 0
+PV_TEMPERATURE_COEFFICIENT_PER_C = -0.004 # Power change per degree of cell temperature above 25C
+PV_NOCT_C = 45 # Nominal operating cell temperature (800 W/m2, 20C air)
+PV_SYSTEM_LOSSES = 0.14 # Inverter, wiring, soiling and mismatch
+STC_IRRADIANCE_W_M2 = 1000
+STC_CELL_TEMPERATURE_C = 25
+
+
+def parse_solar_data(file):
+    """Reads a solar data file and parses its timestamps"""
+    solar_data = pd.read_csv(file, usecols=[SOLAR_TIME_COLUMN, IRRADIANCE_COLUMN, AIR_TEMPERATURE_COLUMN])
+    solar_data[SOLAR_TIME_COLUMN] = pd.to_datetime(solar_data[SOLAR_TIME_COLUMN], dayfirst=True)
+
+    return solar_data
+
+def read_solar_data():
+    """Returns the parsed solar data, cached after the first read"""
+    return read_cached(SOLAR_DATA_FILE, parse_solar_data)
+
+def process_solar_data(solar_data=None):
+    """Averages irradiance and air temperature across years for every leap-year slot, by slot key rather than a datetime groupby.
+    Slots without readings are NaN"""
+    solar_data = read_solar_data() if solar_data is None else solar_data
+    solar_data = solar_data.dropna(subset=[IRRADIANCE_COLUMN, AIR_TEMPERATURE_COLUMN])
+
+    slots = 366 * SOLAR_SLOTS_PER_DAY
+    slot = leap_year_slot(solar_data[SOLAR_TIME_COLUMN], SOLAR_TIME_STEP_MINUTES)
+    slot_counts = np.bincount(slot, minlength=slots)
+
+    climatology = pd.DataFrame(index=pd.Index(leap_year_slot_labels(SOLAR_TIME_STEP_MINUTES), name='Month-Date-Time'))
+    for column in [IRRADIANCE_COLUMN, AIR_TEMPERATURE_COLUMN]:
+        slot_sums = np.bincount(slot, weights=solar_data[column].to_numpy(dtype=float), minlength=slots)
+        climatology[column] = np.divide(slot_sums, slot_counts, out=np.full(slots, np.nan), where=slot_counts > 0)
+
+    return climatology
+
+def pv_power_kw(irradiance_w_m2, air_temperature_c, capacity_kwp=1, temperature_coefficient_per_c=PV_TEMPERATURE_COEFFICIENT_PER_C,
+                noct_c=PV_NOCT_C, system_losses=PV_SYSTEM_LOSSES):
+    """PV output (KW) from irradiance and air temperature arrays: rated power scaled by irradiance, derated for cell temperature and system losses"""
+    irradiance_w_m2 = np.maximum(np.asarray(irradiance_w_m2, dtype=float), 0)
+    cell_temperature_c = np.asarray(air_temperature_c, dtype=float) + (noct_c - 20) / 800 * irradiance_w_m2
+    temperature_factor = 1 + temperature_coefficient_per_c * (cell_temperature_c - STC_CELL_TEMPERATURE_C)
+
+    return np.maximum(capacity_kwp * irradiance_w_m2 / STC_IRRADIANCE_W_M2 * temperature_factor * (1 - system_losses), 0)
+
+def model_solar_generation(solar_climatology, capacity_kwp=PV_CAPACITY_KWP):
+    """Calculates PV generation (KW) for every leap-year slot of the solar climatology, as a Month-Date-Time and Generation KW dataframe"""
+    generation = solar_climatology.index.to_frame(index=False)
+    generation['Generation KW'] = pv_power_kw(solar_climatology[IRRADIANCE_COLUMN], solar_climatology[AIR_TEMPERATURE_COLUMN], capacity_kwp)
+
+    return generation
+
+def add_solar_generation(generation, solar_climatology, capacity_kwp=PV_CAPACITY_KWP):
+    """Adds PV generation to a Month-Date-Time generation dataframe (e.g. from the wind turbines), matched by leap-year slot"""
+    solar_kw = pv_power_kw(solar_climatology[IRRADIANCE_COLUMN], solar_climatology[AIR_TEMPERATURE_COLUMN], capacity_kwp)
+    slot = month_date_time_slot(generation['Month-Date-Time'], SOLAR_TIME_STEP_MINUTES)
+
+    generation = generation.copy()
+    generation['Generation KW'] = generation['Generation KW'] + solar_kw[slot]
+
+    return generation
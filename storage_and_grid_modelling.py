@@ -1,167 +1,385 @@
+import os
+
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+
+from year_calendar import YearCalendar
+from output_backend import OUTPUT_FORMAT
+from profiling import profiled
 
 # If using storage, define storage capacity
 STORAGE_CAPACITY_KWH = 1000 # Set to 0 if don't use any storage
 STORAGE_CHARGE_EFFICIENCY = 0.9
 STORAGE_DISCHARGE_EFFICIENCY = 0.9
+STORAGE_MAX_CHARGE_KW = np.inf # Power ratings, unlimited by default
+STORAGE_MAX_DISCHARGE_KW = np.inf
+STORAGE_SELF_DISCHARGE_PER_HOUR = 0 # Fraction of stored energy lost each hour
+STORAGE_MIN_SOC = 0 # State of charge window, as fractions of the storage capacity
+STORAGE_MAX_SOC = 1
+STORAGE_CAPACITY_FADE_PER_CYCLE = 0 # Fraction of the storage capacity lost per equivalent full cycle
+
+TIME_STEP_HOURS = 0.5 # Half-hourly load data
+
+# Time series of a single run, held in one structured buffer. The grid power columns are derived from the energy columns when read
+TIME_SERIES_COLUMNS = ['Load (KW)', 'Stored Energy (KWH)', 'Storage Power (KW)', 'Grid Usage KWH', 'Grid Supply KWH', 'Renewable Generation (KW)', 'Storage (KW)', 'Grid (KW)']
+TIME_SERIES_DTYPE = np.float64 # np.float32 halves the memory of long runs, the recurrence itself always runs in double precision
+
+# Time series the batched dispatch can keep for every configuration, memory-mapped to a file when they do not fit in memory
+BATCH_TIME_SERIES_COLUMNS = ['Stored Energy (KWH)', 'Grid Usage KWH', 'Grid Supply KWH']
+BATCH_TIME_SERIES_DTYPE = np.float32
 
 STORAGE_OUTPUT_FILE = 'Output Data/Annual Storage Usage.xlsx'
 GRID_OUTPUT_FILE = 'Output Data/Annual Grid Usage.xlsx'
 
-def write_output(data, file):
-    """Write to Excel Speadsheet"""
-    data.to_excel(file, sheet_name='Sheet1')
+def align_generation(load, generation):
+    """Returns the generation values (KW) matching each datetime in the load, by slot offset on the generation calendar"""
+    calendar = YearCalendar.from_datetimes(generation.iloc[:, 0])
+
+    # Every load datetime must be on the generation calendar
+    generation_index = calendar.slot_index(load.iloc[:, 0])
+
+    return generation.iloc[:, 1].to_numpy(dtype=float)[generation_index]
+
+def time_series_buffer(shape, columns, dtype=TIME_SERIES_DTYPE, file=None):
+    """Returns one zeroed structured array with a field per time series column.
+    With a file it is a memory-mapped .npy file, filled on disk and reopened with np.load(file, mmap_mode='r')"""
+    record_dtype = np.dtype([(column, dtype) for column in columns])
+    if file is None:
+        return np.zeros(shape, dtype=record_dtype)
+
+    os.makedirs(os.path.dirname(file) or '.', exist_ok=True)
+    return np.lib.format.open_memmap(file, mode='w+', dtype=record_dtype, shape=shape)
+
+def float_array(values):
+    """Returns values as a float array, leaving float32 arrays float32 rather than copying them to float64"""
+    values = np.asarray(values)
+
+    return values if np.issubdtype(values.dtype, np.floating) else values.astype(float)
+
+def dispatch_storage(load_kw, generation_kw, capacity_kwh, charge_efficiency, discharge_efficiency, time_step_hours=TIME_STEP_HOURS,
+                     max_charge_kw=STORAGE_MAX_CHARGE_KW, max_discharge_kw=STORAGE_MAX_DISCHARGE_KW, self_discharge_per_hour=STORAGE_SELF_DISCHARGE_PER_HOUR,
+                     min_soc=STORAGE_MIN_SOC, max_soc=STORAGE_MAX_SOC, capacity_fade_per_cycle=STORAGE_CAPACITY_FADE_PER_CYCLE, dtype=TIME_SERIES_DTYPE):
+    """Runs the storage state of charge recurrence over load and generation arrays, keeping the time series in one structured buffer"""
+    load_kw = float_array(load_kw)
+    generation_kw = float_array(generation_kw)
+    steps = len(load_kw)
+
+    # Preallocate one output buffer, each column is written through its field view
+    time_series = time_series_buffer(steps, TIME_SERIES_COLUMNS, dtype)
+    time_series['Load (KW)'] = load_kw
+    stored_energy = time_series['Stored Energy (KWH)']
+    storage_power = time_series['Storage Power (KW)']
+    grid_usage_kwh = time_series['Grid Usage KWH']
+    grid_supply_kwh = time_series['Grid Supply KWH']
+    renewable_kw = time_series['Renewable Generation (KW)']
+    storage_kw = time_series['Storage (KW)']
+    grid_kw = time_series['Grid (KW)']
+
+    # State of charge window, the top of it shrinks as the storage degrades
+    min_energy_kwh = capacity_kwh * min_soc
+    max_energy_kwh = capacity_kwh * max_soc
+    usable_energy_kwh = max_energy_kwh - min_energy_kwh
+    retention = (1 - self_discharge_per_hour) ** time_step_hours
+    throughput_kwh = 0.0
+    equivalent_full_cycles = 0.0
 
-def calculate_storage_and_grid_usage(load, generation):
-    """Calculates power and energy rating of storage needed"""
-    storage_time_series = load.iloc[:, [0]].copy()  # Copy the selected columns
-    storage_time_series['Stored Energy (KWH)'] = 0
-    storage_time_series['Storage Power (KW)'] = 0
     peak_storage_power_kw = 0
-    stored_energy_kwh = STORAGE_CAPACITY_KWH #Initialise energy storage at full capacity
+    stored_energy_kwh = max_energy_kwh #Initialise energy storage at full capacity
     stored_energy_prev_kwh = stored_energy_kwh
-    generation_index = 0
-
-    grid = load.iloc[:, [0]].copy()  # Copy the selected columns
-    grid['Grid Usage KWH'] = 0
-    grid['Grid Usage KW'] = 0
-    grid['Grid Supply KWH'] = 0
-    grid['Grid Supply KW'] = 0
-
-    energy_source = load.iloc[:, [0]].copy()  # Copy the selected columns
-    energy_source['Load (KW)'] = load.iloc[:, [1]].copy()
-    energy_source['Renewable Generation (KW)'] = 0
-    energy_source['Storage (KW)'] = 0
-    energy_source['Grid (KW)'] = 0
-
     above_counter = 0
     below_counter = 0
-    matched_gen_load = load.copy()
-    matched_gen_load['Difference'] = 0
-
-    for index, row in load.iterrows():
-        
-        # If a datetime is not present in the load, skip the generation value until reach it
-        while (row.iloc[0] != generation.iloc[generation_index, 0]):
-            generation_index += 2
-        
-        load_half_hourly = row['Total KW']
-        generation_half_hourly = generation.iloc[generation_index, 1]
-        matched_gen_load.iloc[index, 2] = int(generation_half_hourly - load_half_hourly)
-
-        # If generation is greater than the load, generation can handle the power supply
-        if load_half_hourly < generation_half_hourly:
 
-            energy_source.iloc[index, 2] = int(load_half_hourly)
+    # Iterate over plain floats, numpy scalar arithmetic is much slower
+    for index, (load_step, generation_step) in enumerate(zip(load_kw.tolist(), generation_kw.tolist())):
+        full_energy_kwh = max(max_energy_kwh - capacity_kwh * capacity_fade_per_cycle * equivalent_full_cycles, min_energy_kwh)
+        stored_energy_kwh *= retention # Self-discharge, before any charging so a surplus can top the storage back up
 
-            # If we are using storage and the storage is not full, store the excess there
-            if STORAGE_CAPACITY_KWH > 0 and stored_energy_kwh < STORAGE_CAPACITY_KWH:
+        # If generation is greater than the load, generation can handle the power supply
+        if load_step < generation_step:
+            renewable_kw[index] = load_step
+            charge_kw = min(generation_step - load_step, max_charge_kw)
 
-                stored_energy_kwh += STORAGE_CHARGE_EFFICIENCY * (generation_half_hourly - load_half_hourly) * 0.5
+            # If we are using storage and the storage is not full, store the excess there (up to the charge rating)
+            if capacity_kwh > 0 and stored_energy_kwh < full_energy_kwh:
+                stored_energy_kwh += charge_efficiency * charge_kw * time_step_hours
 
                 # If this will exceed the storage capacity, fill it up and supply the remainder to the grid
-                if stored_energy_kwh > STORAGE_CAPACITY_KWH:
-                    grid.iloc[index, 3] = int(stored_energy_kwh - STORAGE_CAPACITY_KWH)
-                    grid.iloc[index, 4] = int(2 * (stored_energy_kwh - STORAGE_CAPACITY_KWH))
-                    stored_energy_kwh = STORAGE_CAPACITY_KWH
+                if stored_energy_kwh > full_energy_kwh:
+                    grid_supply_kwh[index] = stored_energy_kwh - full_energy_kwh
+                    stored_energy_kwh = full_energy_kwh
+
+                # Excess above the charge rating goes to the grid
+                grid_supply_kwh[index] += (generation_step - load_step - charge_kw) * time_step_hours
 
             # Otherwise supply it to the grid
             else:
-                grid.iloc[index, 3] = int((generation_half_hourly - load_half_hourly) * 0.5)
-                grid.iloc[index, 4] = int((generation_half_hourly - load_half_hourly))
-            
+                grid_supply_kwh[index] = (generation_step - load_step) * time_step_hours
+
             above_counter += 1
 
         # If generation is less than load, need energy storage/grid to supply the remainding power
-        elif load_half_hourly > generation_half_hourly:
+        elif load_step > generation_step:
+            renewable_kw[index] = generation_step
 
-            energy_source.iloc[index, 2] = int(generation_half_hourly)
+            required_storage_energy_kwh = (load_step - generation_step) * time_step_hours / discharge_efficiency
+            discharge_kw = min(load_step - generation_step, max_discharge_kw)
+            discharge_energy_kwh = discharge_kw * time_step_hours / discharge_efficiency
+            available_energy_kwh = stored_energy_kwh - min_energy_kwh
 
-            required_storage_energy_kwh = (load_half_hourly - generation_half_hourly) * 0.5 / STORAGE_DISCHARGE_EFFICIENCY # Add to cumulative energy storage total
+            # If we can use the stored energy, use that (up to the discharge rating)
+            if available_energy_kwh >= discharge_energy_kwh:
+                drawn_energy_kwh = discharge_energy_kwh
 
-            # If we can use the stored energy, use that
-            if stored_energy_kwh >= required_storage_energy_kwh:
-                stored_energy_kwh -= required_storage_energy_kwh
-
-                energy_source.iloc[index, 3] = int(required_storage_energy_kwh * 2)
                 # Update the peak energy storage power if this is a new maximum
-                if (load_half_hourly - generation_half_hourly) > peak_storage_power_kw:
-                    peak_storage_power_kw = load_half_hourly - generation_half_hourly
-
-            # If there is some (but not enough) energy in the storage, use the rest of that. Then use the grid
-            elif stored_energy_kwh < required_storage_energy_kwh and stored_energy_kwh > 0:
-                grid.iloc[index, 1] = int(required_storage_energy_kwh - stored_energy_kwh)
-                grid.iloc[index, 2] = int(2 * (required_storage_energy_kwh - stored_energy_kwh))
+                if discharge_kw > peak_storage_power_kw:
+                    peak_storage_power_kw = discharge_kw
 
-                energy_source.iloc[index, 3] = int(2 * stored_energy_kwh)
-                energy_source.iloc[index, 4] = int(2 * (required_storage_energy_kwh - stored_energy_kwh))
+            # If there is some (but not enough) energy in the storage, use the rest of that
+            elif available_energy_kwh > 0:
+                drawn_energy_kwh = available_energy_kwh
 
-                stored_energy_kwh = 0
-            # Otherwise there is no storage left. Use the grid for full supply
+            # Otherwise there is no storage left
             else:
-                grid.iloc[index, 1] = int(required_storage_energy_kwh)
-                grid.iloc[index, 2] = int(2 * required_storage_energy_kwh)
+                drawn_energy_kwh = 0.0
 
-                energy_source.iloc[index, 4] = int(2 * required_storage_energy_kwh)
+            # Then use the grid for the remainder
+            stored_energy_kwh -= drawn_energy_kwh
+            storage_kw[index] = drawn_energy_kwh / time_step_hours
+            grid_usage_kwh[index] = required_storage_energy_kwh - drawn_energy_kwh
+            grid_kw[index] = (required_storage_energy_kwh - drawn_energy_kwh) / time_step_hours
+
+            # Degradation counted by the energy cycled through the storage
+            throughput_kwh += drawn_energy_kwh
+            if usable_energy_kwh > 0:
+                equivalent_full_cycles = throughput_kwh / usable_energy_kwh
 
             below_counter += 1
-        elif load_half_hourly == generation_half_hourly:
-            # Do nothing when the load exactly matches generation (no energy storage release/recharge)
-            energy_source.iloc[index, 2] = int(generation_half_hourly)
-            pass
-       
-        storage_time_series.iloc[index, 1] = int(stored_energy_kwh)
-        storage_time_series.iloc[index, 2] = int(2 * (stored_energy_kwh - stored_energy_prev_kwh))
+
+        # When the load exactly matches generation there is no energy storage release/recharge
+        else:
+            renewable_kw[index] = generation_step
+
+        stored_energy[index] = stored_energy_kwh
+        storage_power[index] = (stored_energy_kwh - stored_energy_prev_kwh) / time_step_hours
         stored_energy_prev_kwh = stored_energy_kwh
-        
-        generation_index += 2
-
-    energy_source_sums = energy_source.iloc[:, 2:].sum().to_dict()
-
-    print("Energy storage size: {:.2f} KWh".format(STORAGE_CAPACITY_KWH))
-    print("Peak energy power: {:.2f} KW".format(peak_storage_power_kw))
-    print("Started analysis with {:.2f} Kwh energy stored".format(STORAGE_CAPACITY_KWH))
-    print("Ended analysis with {:.2f} Kwh energy stored".format(stored_energy_kwh))    
-    print("Generation above load for: {:.2f}%".format(100 * above_counter / (above_counter + below_counter)))
-    print("Generation below load for: {:.2f}%".format(100 * below_counter / (above_counter + below_counter)))
-
-    # If there is more energy available than what was started year with, it is sustainable
-    if (stored_energy_kwh >= STORAGE_CAPACITY_KWH):
-        print('\033[92m' + 'Sustainable solution!!!!!!' + '\033[0m')
-    else:
-        print("Unsustainable solution. This is difference of: {:.2f} Kwh".format(stored_energy_kwh - STORAGE_CAPACITY_KWH))
-
-    # fig, ax = plt.subplots(figsize=(8, 6))
-    # matched_gen_load.plot(0, 2, ax=ax, label='Data')
-    # ax.axhline(y=0, color='gray', linestyle='--', label='Generation = Load')
-
-
-    fig, ax = plt.subplots(figsize=(8, 6))
-    grid.plot(0, 2, ax=ax, label='Grid usage (KW)')
-    grid.plot(0, 4, ax=ax, label='Grid supply (KW)')
-    ax.set_title('Grid Usage and Supply (KW)')
-    ax.legend()
-
-    fig, ax = plt.subplots(figsize=(8, 6))
-    storage_time_series.plot(0, 1, ax=ax, label='Stored Energy (KWH)')
-    storage_time_series.plot(0, 2, ax=ax, label='Energy Storage power (KW)')
-    ax.set_title('Energy storage')
-    ax.legend()
-
-    print("------------- Grid Statistics --------------")
-    print("Required Grid Energy (KWH): {:.2f}".format(np.sum(grid.iloc[:, 1])))
-    print("Supplied Grid Energy (KWH): {:.2f}".format(np.sum(grid.iloc[:, 3])))
-
-    print("-------- Energy Source Statistics ----------")
-    total_load = load.iloc[:, 1].sum()
-    print("Renewable (KW): {:.2f}%".format(100 * energy_source_sums['Renewable Generation (KW)'] / total_load))
-    print("Storage (KW): {:.2f}%".format(100 * energy_source_sums['Storage (KW)'] / total_load))
-    print("Grid (KW): {:.2f}%".format(100 * energy_source_sums['Grid (KW)'] / total_load))
-
-    fig, ax = plt.subplots()
-    ax.pie(energy_source_sums.values(), labels=energy_source_sums.keys())
-
-    write_output(storage_time_series, STORAGE_OUTPUT_FILE)
-    write_output(grid, GRID_OUTPUT_FILE)
\ No newline at end of file
+
+    return {
+        'time_series': time_series,
+        'time_step_hours': time_step_hours,
+        'peak_storage_power_kw': peak_storage_power_kw,
+        'initial_stored_energy_kwh': max_energy_kwh,
+        'final_stored_energy_kwh': stored_energy_kwh,
+        'equivalent_full_cycles': equivalent_full_cycles,
+        'remaining_capacity_kwh': max(max_energy_kwh - capacity_kwh * capacity_fade_per_cycle * equivalent_full_cycles, min_energy_kwh),
+        'above_counter': above_counter,
+        'below_counter': below_counter,
+    }
+
+def dispatch_storage_batch(load_kw, generation_kw, capacity_kwh, charge_efficiency, discharge_efficiency, time_step_hours=TIME_STEP_HOURS,
+                           max_charge_kw=STORAGE_MAX_CHARGE_KW, max_discharge_kw=STORAGE_MAX_DISCHARGE_KW, self_discharge_per_hour=STORAGE_SELF_DISCHARGE_PER_HOUR,
+                           min_soc=STORAGE_MIN_SOC, max_soc=STORAGE_MAX_SOC, capacity_fade_per_cycle=STORAGE_CAPACITY_FADE_PER_CYCLE, time_series=None, tariff=None):
+    """Runs the storage recurrence for many storage configurations at once, advancing all of them each timestep.
+    Every storage parameter is broadcast against the others, so power ratings and the state of charge window sweep too.
+    Optionally fills a time_series_buffer of BATCH_TIME_SERIES_COLUMNS shaped (slots,) + the configurations' shape.
+    With a tariff schedule (cost_modelling.TariffSchedule) the annual import cost, export revenue and demand charge
+    of every configuration are accumulated as it runs, without keeping the time series"""
+    # Load and generation are either shared by every configuration (slots,) or one column each (slots, configurations).
+    # float32 inputs stay float32, the surplus is taken one step at a time rather than as another full array
+    load_kw = float_array(load_kw)
+    generation_kw = float_array(generation_kw)
+    if load_kw.ndim != generation_kw.ndim:
+        load_kw, generation_kw = load_kw.reshape(len(load_kw), -1), generation_kw.reshape(len(generation_kw), -1)
+
+    configurations = np.broadcast_shapes(load_kw.shape[1:], generation_kw.shape[1:])
+    capacity_kwh, charge_efficiency, discharge_efficiency, max_charge_kw, max_discharge_kw, self_discharge_per_hour, min_soc, max_soc, capacity_fade_per_cycle, _ = np.broadcast_arrays(
+        *[np.asarray(parameter, dtype=float) for parameter in (capacity_kwh, charge_efficiency, discharge_efficiency, max_charge_kw, max_discharge_kw,
+                                                                self_discharge_per_hour, min_soc, max_soc, capacity_fade_per_cycle)], np.empty(configurations))
+
+    if time_series is not None:
+        if time_series.shape != (len(load_kw),) + capacity_kwh.shape:
+            raise ValueError("Time series buffer is shaped {}, expected {}".format(time_series.shape, (len(load_kw),) + capacity_kwh.shape))
+        stored_energy_series, grid_usage_series, grid_supply_series = [time_series[column] for column in BATCH_TIME_SERIES_COLUMNS]
+
+    # State of charge window, the top of it shrinks as the storage degrades
+    min_energy_kwh = capacity_kwh * min_soc
+    max_energy_kwh = capacity_kwh * max_soc
+    usable_energy_kwh = max_energy_kwh - min_energy_kwh
+    fade_kwh_per_cycle = capacity_kwh * capacity_fade_per_cycle
+    retention = (1 - self_discharge_per_hour) ** time_step_hours
+
+    stored_energy_kwh = max_energy_kwh.copy() #Initialise energy storage at full capacity
+    full_energy_kwh = max_energy_kwh.copy()
+    equivalent_full_cycles = np.zeros(capacity_kwh.shape)
+    throughput_kwh = np.zeros(capacity_kwh.shape)
+    peak_storage_power_kw = np.zeros(capacity_kwh.shape)
+    grid_usage_kwh = np.zeros(capacity_kwh.shape)
+    grid_supply_kwh = np.zeros(capacity_kwh.shape)
+    has_storage = capacity_kwh > 0
+    if tariff is not None:
+        import_cost = np.zeros(capacity_kwh.shape)
+        export_revenue = np.zeros(capacity_kwh.shape)
+        monthly_peak_grid_kw = np.zeros((tariff.periods,) + capacity_kwh.shape)
+
+    for step, (load_step, generation_step) in enumerate(zip(load_kw, generation_kw)):
+        stored_energy_kwh = stored_energy_kwh * retention # Self-discharge, before any charging so a surplus can top the storage back up
+        surplus_step = generation_step - load_step
+        excess_kw = np.maximum(surplus_step, 0)
+        deficit_kw = np.maximum(-surplus_step, 0)
+
+        # Store the excess (up to the charge rating) while storage is not full, otherwise supply it to the grid
+        charge_kw = np.minimum(excess_kw, max_charge_kw)
+        charging = (excess_kw > 0) & has_storage & (stored_energy_kwh < full_energy_kwh)
+        charged_energy_kwh = stored_energy_kwh + charge_efficiency * charge_kw * time_step_hours
+        grid_supply_step_kwh = np.where(charging, np.maximum(charged_energy_kwh - full_energy_kwh, 0) + (excess_kw - charge_kw) * time_step_hours, excess_kw * time_step_hours)
+        grid_supply_kwh += grid_supply_step_kwh
+
+        # Use the stored energy (up to the discharge rating) if there is enough, otherwise empty it. Then use the grid for the rest
+        discharge_kw = np.minimum(deficit_kw, max_discharge_kw)
+        discharge_energy_kwh = discharge_kw * time_step_hours / discharge_efficiency
+        available_energy_kwh = stored_energy_kwh - min_energy_kwh
+        from_storage = available_energy_kwh >= discharge_energy_kwh
+        drawn_energy_kwh = np.where(from_storage, discharge_energy_kwh, np.maximum(available_energy_kwh, 0))
+        grid_usage_step_kwh = deficit_kw * time_step_hours / discharge_efficiency - drawn_energy_kwh
+        grid_usage_kwh += grid_usage_step_kwh
+        peak_storage_power_kw = np.where(from_storage, np.maximum(peak_storage_power_kw, discharge_kw), peak_storage_power_kw)
+
+        stored_energy_kwh = np.where(charging, np.minimum(charged_energy_kwh, full_energy_kwh), stored_energy_kwh - drawn_energy_kwh)
+
+        # Degradation counted by the energy cycled through the storage
+        throughput_kwh += drawn_energy_kwh
+        np.divide(throughput_kwh, usable_energy_kwh, out=equivalent_full_cycles, where=usable_energy_kwh > 0)
+        full_energy_kwh = np.maximum(max_energy_kwh - fade_kwh_per_cycle * equivalent_full_cycles, min_energy_kwh)
+
+        if time_series is not None:
+            stored_energy_series[step] = stored_energy_kwh
+            grid_usage_series[step] = grid_usage_step_kwh
+            grid_supply_series[step] = grid_supply_step_kwh
+        if tariff is not None:
+            import_cost += tariff.import_price_per_kwh[step] * grid_usage_step_kwh
+            export_revenue += tariff.export_price_per_kwh[step] * grid_supply_step_kwh
+            peak_grid_kw = monthly_peak_grid_kw[tariff.period[step]]
+            np.maximum(peak_grid_kw, grid_usage_step_kwh / time_step_hours, out=peak_grid_kw)
+
+    summary = {
+        'Storage Capacity (KWH)': capacity_kwh,
+        'Charge Efficiency': charge_efficiency,
+        'Discharge Efficiency': discharge_efficiency,
+        'Max Charge Power (KW)': max_charge_kw,
+        'Max Discharge Power (KW)': max_discharge_kw,
+        'Peak Storage Power (KW)': peak_storage_power_kw,
+        'Final Stored Energy (KWH)': stored_energy_kwh,
+        'Equivalent Full Cycles': equivalent_full_cycles,
+        'Remaining Capacity (KWH)': full_energy_kwh,
+        'Grid Usage KWH': grid_usage_kwh,
+        'Grid Supply KWH': grid_supply_kwh,
+        # Sustainable when the storage ends the year full, at its faded capacity
+        'Sustainable': stored_energy_kwh >= full_energy_kwh,
+    }
+    if tariff is not None:
+        summary['Import Cost ($)'] = import_cost / tariff.years
+        summary['Export Revenue ($)'] = export_revenue / tariff.years
+        summary['Demand Charge ($)'] = np.tensordot(tariff.demand_charge_per_kw, monthly_peak_grid_kw, axes=(0, 0)) / tariff.years
+
+    return summary
+
+def build_output_frame(datetimes, dispatch, columns):
+    """Builds an output dataframe from dispatch arrays"""
+    output = pd.DataFrame({'datetime': datetimes})
+    for column in columns:
+        output[column] = dispatch[column]
+
+    return output
+
+class StorageResult:
+    """Time series and summary metrics of one storage dispatch run, with no plotting or file output.
+    A regular datetime series is kept as its calendar (start and time step), the time series as the dispatch's structured buffer"""
+    __slots__ = ('calendar', 'irregular_datetimes', 'capacity_kwh', 'time_step_hours', 'time_series', 'metrics')
+
+    STORAGE_COLUMNS = ['Stored Energy (KWH)', 'Storage Power (KW)']
+    GRID_COLUMNS = ['Grid Usage KWH', 'Grid Usage KW', 'Grid Supply KWH', 'Grid Supply KW']
+    ENERGY_SOURCE_COLUMNS = ['Renewable Generation (KW)', 'Storage (KW)', 'Grid (KW)']
+    DERIVED_POWER_COLUMNS = {'Grid Usage KW': 'Grid Usage KWH', 'Grid Supply KW': 'Grid Supply KWH'}
+
+    def __init__(self, datetimes, dispatch, capacity_kwh):
+        try:
+            self.calendar, self.irregular_datetimes = YearCalendar.from_datetimes(datetimes), None
+        except ValueError:
+            self.calendar, self.irregular_datetimes = None, np.asarray(datetimes)
+        self.capacity_kwh = capacity_kwh
+        self.time_step_hours = dispatch['time_step_hours']
+        self.time_series = dispatch['time_series']
+
+        # Totals in double precision whatever the time series dtype
+        totals = {column: np.sum(self.time_series[column], dtype=np.float64) for column in TIME_SERIES_COLUMNS}
+        steps = dispatch['above_counter'] + dispatch['below_counter']
+        total_load = totals['Load (KW)']
+        self.metrics = {
+            'Storage Capacity (KWH)': capacity_kwh,
+            'Peak Storage Power (KW)': dispatch['peak_storage_power_kw'],
+            'Initial Stored Energy (KWH)': dispatch['initial_stored_energy_kwh'],
+            'Final Stored Energy (KWH)': dispatch['final_stored_energy_kwh'],
+            'Equivalent Full Cycles': dispatch['equivalent_full_cycles'],
+            'Remaining Capacity (KWH)': dispatch['remaining_capacity_kwh'],
+            'Generation Above Load (%)': 100 * dispatch['above_counter'] / steps,
+            'Generation Below Load (%)': 100 * dispatch['below_counter'] / steps,
+            'Grid Usage KWH': totals['Grid Usage KWH'],
+            'Grid Supply KWH': totals['Grid Supply KWH'],
+            'Renewable (%)': 100 * totals['Renewable Generation (KW)'] / total_load,
+            'Storage (%)': 100 * totals['Storage (KW)'] / total_load,
+            'Grid (%)': 100 * totals['Grid (KW)'] / total_load,
+            # If the storage ends the year full (at its faded capacity), as it started, it is sustainable
+            'Sustainable': dispatch['final_stored_energy_kwh'] >= dispatch['remaining_capacity_kwh'],
+        }
+
+    @property
+    def datetimes(self):
+        return self.calendar.datetimes() if self.calendar is not None else self.irregular_datetimes
+
+    def column(self, column):
+        """Returns one time series column, deriving the grid power columns from their energy columns"""
+        if column in self.DERIVED_POWER_COLUMNS:
+            return self.time_series[self.DERIVED_POWER_COLUMNS[column]] / self.time_step_hours
+
+        return self.time_series[column]
+
+    def frame(self, columns):
+        return build_output_frame(self.datetimes, {column: self.column(column) for column in columns}, columns)
+
+    def storage_frame(self):
+        return self.frame(self.STORAGE_COLUMNS)
+
+    def grid_frame(self):
+        return self.frame(self.GRID_COLUMNS)
+
+    def energy_source_frame(self):
+        return self.frame(['Load (KW)'] + self.ENERGY_SOURCE_COLUMNS)
+
+    def summary(self):
+        return pd.Series(self.metrics)
+
+@profiled
+def calculate_storage_and_grid_usage(load, generation, capacity_kwh=STORAGE_CAPACITY_KWH, charge_efficiency=STORAGE_CHARGE_EFFICIENCY, discharge_efficiency=STORAGE_DISCHARGE_EFFICIENCY,
+                                     display=True, plot=False, export=False, output_format=OUTPUT_FORMAT):
+    """Calculates power and energy rating of storage needed. Printing, plotting and writing the outputs are chosen per call"""
+    load_kw = load['Total KW'].to_numpy(dtype=float)
+    generation_kw = align_generation(load, generation)
+
+    dispatch = dispatch_storage(load_kw, generation_kw, capacity_kwh, charge_efficiency, discharge_efficiency)
+    result = StorageResult(load.iloc[:, 0], dispatch, capacity_kwh)
+
+    if display or plot or export:
+        from storage_report import report_storage_and_grid_usage # Report layer only loads when used
+        report_storage_and_grid_usage(result, display, plot, export, output_format)
+
+    return result
+
+def sweep_storage_capacity(load, generation, capacities_kwh, charge_efficiencies=STORAGE_CHARGE_EFFICIENCY, discharge_efficiencies=STORAGE_DISCHARGE_EFFICIENCY,
+                           max_charge_kw=STORAGE_MAX_CHARGE_KW, max_discharge_kw=STORAGE_MAX_DISCHARGE_KW):
+    """Simulates every storage capacity/efficiency/power rating combination against the same load and generation.
+    Capacities, efficiencies and power ratings are broadcast against each other, one summary row per configuration"""
+    load_kw = load['Total KW'].to_numpy(dtype=float)
+    generation_kw = align_generation(load, generation)
+
+    summary = dispatch_storage_batch(load_kw, generation_kw, capacities_kwh, charge_efficiencies, discharge_efficiencies, max_charge_kw=max_charge_kw, max_discharge_kw=max_discharge_kw)
+
+    return pd.DataFrame({column: np.ravel(values) for column, values in summary.items()})
\ No newline at end of file
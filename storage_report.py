@@ -0,0 +1,79 @@
+from output_backend import OUTPUT_FORMAT, SCENARIO_DATASET_DIRECTORY, write_output, append_partition
+from storage_and_grid_modelling import STORAGE_OUTPUT_FILE, GRID_OUTPUT_FILE
+
+
+def display_results(result):
+    """Prints the storage, grid and energy source statistics of a storage result"""
+    metrics = result.metrics
+
+    print("Energy storage size: {:.2f} KWh".format(metrics['Storage Capacity (KWH)']))
+    print("Peak energy power: {:.2f} KW".format(metrics['Peak Storage Power (KW)']))
+    print("Started analysis with {:.2f} Kwh energy stored".format(metrics['Initial Stored Energy (KWH)']))
+    print("Ended analysis with {:.2f} Kwh energy stored".format(metrics['Final Stored Energy (KWH)']))
+    print("Generation above load for: {:.2f}%".format(metrics['Generation Above Load (%)']))
+    print("Generation below load for: {:.2f}%".format(metrics['Generation Below Load (%)']))
+    if metrics['Remaining Capacity (KWH)'] < metrics['Initial Stored Energy (KWH)']:
+        print("Equivalent full cycles: {:.2f}, remaining capacity: {:.2f} KWh".format(metrics['Equivalent Full Cycles'], metrics['Remaining Capacity (KWH)']))
+
+    if metrics['Sustainable']:
+        print('\033[92m' + 'Sustainable solution!!!!!!' + '\033[0m')
+    else:
+        # Shortfall from full at the faded capacity, the level the sustainable check uses
+        print("Unsustainable solution. This is difference of: {:.2f} Kwh".format(metrics['Final Stored Energy (KWH)'] - metrics['Remaining Capacity (KWH)']))
+
+    print("------------- Grid Statistics --------------")
+    print("Required Grid Energy (KWH): {:.2f}".format(metrics['Grid Usage KWH']))
+    print("Supplied Grid Energy (KWH): {:.2f}".format(metrics['Grid Supply KWH']))
+
+    print("-------- Energy Source Statistics ----------")
+    print("Renewable (KW): {:.2f}%".format(metrics['Renewable (%)']))
+    print("Storage (KW): {:.2f}%".format(metrics['Storage (%)']))
+    print("Grid (KW): {:.2f}%".format(metrics['Grid (%)']))
+
+
+def plot_results(result):
+    """Plots grid usage and supply, stored energy and the share of each energy source"""
+    import matplotlib.pyplot as plt # Only loaded when plotting
+
+    grid = result.grid_frame()
+    storage_time_series = result.storage_frame()
+    energy_source_sums = result.energy_source_frame().iloc[:, 2:].sum().to_dict()
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    grid.plot(0, 2, ax=ax, label='Grid usage (KW)')
+    grid.plot(0, 4, ax=ax, label='Grid supply (KW)')
+    ax.set_title('Grid Usage and Supply (KW)')
+    ax.legend()
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    storage_time_series.plot(0, 1, ax=ax, label='Stored Energy (KWH)')
+    storage_time_series.plot(0, 2, ax=ax, label='Energy Storage power (KW)')
+    ax.set_title('Energy storage')
+    ax.legend()
+
+    fig, ax = plt.subplots()
+    ax.pie(energy_source_sums.values(), labels=energy_source_sums.keys())
+
+
+def export_results(result, output_format=OUTPUT_FORMAT, storage_file=STORAGE_OUTPUT_FILE, grid_file=GRID_OUTPUT_FILE):
+    """Writes the storage and grid time series, Excel only when asked for"""
+    write_output(result.storage_frame(), storage_file, output_format)
+    write_output(result.grid_frame(), grid_file, output_format)
+
+
+def append_results(result, partition, directory=SCENARIO_DATASET_DIRECTORY, output_format=OUTPUT_FORMAT):
+    """Appends the storage and grid time series of one scenario to the scenario dataset"""
+    time_series = result.storage_frame().merge(result.grid_frame(), on='datetime')
+
+    return append_partition(time_series, partition, directory, output_format)
+
+
+def report_storage_and_grid_usage(result, display=True, plot=True, export=True, output_format=OUTPUT_FORMAT):
+    """Prints, plots and writes the storage and grid usage of a storage result, each optional"""
+    if display:
+        display_results(result)
+    if plot:
+        plot_results(result)
+    if export:
+        export_results(result, output_format)
+
@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+from storage_and_grid_modelling import STORAGE_CHARGE_EFFICIENCY, STORAGE_DISCHARGE_EFFICIENCY, STORAGE_MAX_CHARGE_KW, STORAGE_MAX_DISCHARGE_KW, STORAGE_SELF_DISCHARGE_PER_HOUR, \
+    STORAGE_MIN_SOC, STORAGE_MAX_SOC, STORAGE_CAPACITY_FADE_PER_CYCLE, TIME_STEP_HOURS, align_generation, dispatch_storage, dispatch_storage_batch
+
+# 'self_sufficient': smallest storage needing no grid energy (sequent peak, one pass)
+# 'grid_import': smallest storage with grid energy at or below the target (KWH)
+# 'renewable_fraction': smallest storage meeting at least the target fraction of load without the grid
+# 'sustainable': largest storage that still ends the year at least as full as it started
+SIZING_TARGETS = ('self_sufficient', 'grid_import', 'renewable_fraction', 'sustainable')
+SIZING_TOLERANCE_KWH = 1
+SIZING_POINTS = 64 # Capacities dispatched together to bracket the target, before bisecting with the single-run kernel
+SIZING_MAX_DOUBLINGS = 30 # Capacity doublings searched beyond the sequent peak size for batteries with losses or limits
+SIZING_GRID_TOLERANCE_KWH = 1e-6 # Grid energy change below which more capacity is taken to change nothing
+
+
+def storage_deficit_kwh(load_kw, generation_kw, charge_efficiency=STORAGE_CHARGE_EFFICIENCY, discharge_efficiency=STORAGE_DISCHARGE_EFFICIENCY, time_step_hours=TIME_STEP_HOURS):
+    """Returns the energy drawn below full (KWH) at each step for unlimited storage that starts full (sequent peak)"""
+    surplus_kw = np.asarray(generation_kw, dtype=float) - np.asarray(load_kw, dtype=float)
+    net_draw_kwh = np.where(surplus_kw < 0, -surplus_kw * time_step_hours / discharge_efficiency, -charge_efficiency * surplus_kw * time_step_hours)
+
+    # Cumulative draw, reset whenever the storage would be full again
+    cumulative_draw_kwh = np.cumsum(net_draw_kwh)
+
+    return cumulative_draw_kwh - np.minimum.accumulate(np.minimum(cumulative_draw_kwh, 0))
+
+
+def battery_parameters(battery=None):
+    """Returns the battery parameters passed to dispatch_storage_batch: the STORAGE_* settings, updated with any given in battery"""
+    parameters = {
+        'max_charge_kw': STORAGE_MAX_CHARGE_KW,
+        'max_discharge_kw': STORAGE_MAX_DISCHARGE_KW,
+        'self_discharge_per_hour': STORAGE_SELF_DISCHARGE_PER_HOUR,
+        'min_soc': STORAGE_MIN_SOC,
+        'max_soc': STORAGE_MAX_SOC,
+        'capacity_fade_per_cycle': STORAGE_CAPACITY_FADE_PER_CYCLE,
+    }
+    parameters.update(battery or {})
+
+    return parameters
+
+
+def ideal_battery(battery):
+    """Returns whether a battery only loses energy to charge and discharge efficiency, so the sequent peak size is exact"""
+    return (np.isinf(battery['max_charge_kw']) and np.isinf(battery['max_discharge_kw']) and battery['self_discharge_per_hour'] == 0
+            and battery['capacity_fade_per_cycle'] == 0)
+
+
+def evaluate_capacities(load_kw, generation_kw, capacities_kwh, charge_efficiency, discharge_efficiency, battery=None):
+    """Dispatches several storage capacities together, adding the fraction of load met without the grid"""
+    summary = dispatch_storage_batch(load_kw, generation_kw, capacities_kwh, charge_efficiency, discharge_efficiency, **battery_parameters(battery))
+    summary['Renewable Fraction'] = 1 - summary['Grid Usage KWH'] / (np.sum(load_kw) * TIME_STEP_HOURS)
+
+    return summary
+
+
+def meets_target(summary, target, target_value):
+    """Returns whether each dispatched capacity meets the sizing target"""
+    if target == 'grid_import':
+        return summary['Grid Usage KWH'] <= target_value
+    if target == 'renewable_fraction':
+        return summary['Renewable Fraction'] >= target_value
+
+    return summary['Sustainable']
+
+
+def summary_row(summary, index):
+    """Returns one dispatched capacity's values from a batch summary"""
+    return {column: values[index] for column, values in summary.items()}
+
+
+def saturation_capacity_kwh(load_kw, generation_kw, charge_efficiency, discharge_efficiency, battery):
+    """Returns the capacity (KWH) beyond which more storage changes nothing: the sequent peak size over the state of charge window
+    for an ideal battery. With power limits, self-discharge or fade that is only a starting point, and the capacity is found on a
+    ladder of doublings of it (dispatched in one batch) where doubling again no longer changes the grid energy"""
+    capacity_kwh = storage_deficit_kwh(load_kw, generation_kw, charge_efficiency, discharge_efficiency).max(initial=0) / (battery['max_soc'] - battery['min_soc'])
+    if ideal_battery(battery):
+        return capacity_kwh
+
+    ladder_kwh = max(capacity_kwh, SIZING_TOLERANCE_KWH) * 2.0 ** np.arange(SIZING_MAX_DOUBLINGS + 1)
+    grid_usage_kwh = evaluate_capacities(load_kw, generation_kw, ladder_kwh, charge_efficiency, discharge_efficiency, battery)['Grid Usage KWH']
+    unchanged = np.abs(np.diff(grid_usage_kwh)) <= SIZING_GRID_TOLERANCE_KWH
+    if not unchanged.any():
+        raise ValueError("Grid energy still changes with storage capacity at {:.0f} KWH".format(ladder_kwh[-1]))
+
+    return ladder_kwh[np.argmax(unchanged)]
+
+
+def evaluate_capacity(load_kw, generation_kw, capacity_kwh, charge_efficiency, discharge_efficiency, battery=None):
+    """Dispatches one storage capacity with the single-run kernel, much faster than a batch of one. Returns the columns of evaluate_capacities"""
+    dispatch = dispatch_storage(load_kw, generation_kw, capacity_kwh, charge_efficiency, discharge_efficiency, **battery_parameters(battery))
+    grid_usage_kwh = np.sum(dispatch['time_series']['Grid Usage KWH'])
+
+    return {
+        'Storage Capacity (KWH)': capacity_kwh,
+        'Peak Storage Power (KW)': dispatch['peak_storage_power_kw'],
+        'Grid Usage KWH': grid_usage_kwh,
+        'Grid Supply KWH': np.sum(dispatch['time_series']['Grid Supply KWH']),
+        'Renewable Fraction': 1 - grid_usage_kwh / (np.sum(load_kw) * TIME_STEP_HOURS),
+        'Sustainable': dispatch['final_stored_energy_kwh'] >= dispatch['remaining_capacity_kwh'],
+    }
+
+
+def narrow_capacity(load_kw, generation_kw, target, target_value, upper_kwh, charge_efficiency, discharge_efficiency, tolerance_kwh, battery=None):
+    """Narrows the capacity range from 0 to upper_kwh (the saturation capacity) where the target switches from unmet to met
+    (met to unmet for 'sustainable'). The targets are monotonic in capacity. One batch of SIZING_POINTS capacities and both range ends
+    brackets the switch: a target met without storage needs none, one not met at upper_kwh cannot be met, and storage still sustainable
+    at upper_kwh is sustainable at any size. The bracket is then bisected one capacity at a time. Returns the capacity and its dispatch summary"""
+    capacities_kwh = np.linspace(0, upper_kwh, SIZING_POINTS + 2)
+    summary = evaluate_capacities(load_kw, generation_kw, capacities_kwh, charge_efficiency, discharge_efficiency, battery)
+    met = meets_target(summary, target, target_value)
+
+    if target == 'sustainable':
+        if met[-1]:
+            return np.inf, summary_row(summary, -1)
+        switched = ~met
+        switched[0] = False
+    else:
+        if not met[-1]:
+            raise ValueError("No storage capacity meets the {} target of {}".format(target, target_value))
+        if met[0]:
+            return 0, summary_row(summary, 0)
+        switched = met
+
+    first_switched = np.argmax(switched)
+    lower_kwh, upper_kwh = capacities_kwh[first_switched - 1], capacities_kwh[first_switched]
+    lower_summary, upper_summary = summary_row(summary, first_switched - 1), summary_row(summary, first_switched)
+
+    while upper_kwh - lower_kwh > tolerance_kwh:
+        middle_kwh = (lower_kwh + upper_kwh) / 2
+        middle_summary = evaluate_capacity(load_kw, generation_kw, middle_kwh, charge_efficiency, discharge_efficiency, battery)
+        middle_met = meets_target(middle_summary, target, target_value)
+        if middle_met != (target == 'sustainable'):
+            upper_kwh, upper_summary = middle_kwh, middle_summary
+        else:
+            lower_kwh, lower_summary = middle_kwh, middle_summary
+
+    return (lower_kwh, lower_summary) if target == 'sustainable' else (upper_kwh, upper_summary)
+
+
+def solve_capacity(load_kw, generation_kw, target, target_value, charge_efficiency, discharge_efficiency, tolerance_kwh, battery):
+    """Returns the storage capacity (KWH) meeting a sizing target, with its dispatch summary when the solve dispatched it (otherwise None)
+    and the saturation capacity"""
+    if target not in SIZING_TARGETS:
+        raise ValueError("Unknown sizing target '{}', expected one of {}".format(target, SIZING_TARGETS))
+
+    # Beyond the saturation capacity the storage never empties, so more capacity changes nothing
+    saturation_kwh = saturation_capacity_kwh(load_kw, generation_kw, charge_efficiency, discharge_efficiency, battery)
+    ideal = ideal_battery(battery)
+
+    # Needing no grid energy at all is the sequent peak size, not a search, for an ideal battery
+    if target == 'self_sufficient' or (target == 'grid_import' and target_value <= 0) or (target == 'renewable_fraction' and target_value >= 1):
+        if ideal:
+            return saturation_kwh, None, saturation_kwh
+        target, target_value = 'grid_import', 0
+
+    # Ideal storage that never empties ends the year full only if the unlimited storage did
+    if target == 'sustainable' and ideal and storage_deficit_kwh(load_kw, generation_kw, charge_efficiency, discharge_efficiency)[-1] == 0:
+        return np.inf, None, saturation_kwh
+
+    capacity_kwh, summary = narrow_capacity(load_kw, generation_kw, target, target_value, saturation_kwh, charge_efficiency, discharge_efficiency, tolerance_kwh, battery)
+
+    return capacity_kwh, summary, saturation_kwh
+
+
+def size_storage_kwh(load_kw, generation_kw, target='self_sufficient', target_value=0, charge_efficiency=STORAGE_CHARGE_EFFICIENCY, discharge_efficiency=STORAGE_DISCHARGE_EFFICIENCY, tolerance_kwh=SIZING_TOLERANCE_KWH,
+                     battery=None):
+    """Returns the storage capacity (KWH) meeting a sizing target for aligned load and generation arrays.
+    battery holds any dispatch_storage_batch battery parameters (power ratings, self-discharge, state of charge window, fade) to size with,
+    the rest are the STORAGE_* settings"""
+    return solve_capacity(load_kw, generation_kw, target, target_value, charge_efficiency, discharge_efficiency, tolerance_kwh, battery_parameters(battery))[0]
+
+
+def size_storage(load, generation, target='self_sufficient', target_value=0, charge_efficiency=STORAGE_CHARGE_EFFICIENCY, discharge_efficiency=STORAGE_DISCHARGE_EFFICIENCY, tolerance_kwh=SIZING_TOLERANCE_KWH,
+                 battery=None):
+    """Finds the storage capacity meeting a sizing target, with the storage power rating and grid usage it results in"""
+    load_kw = load['Total KW'].to_numpy(dtype=float)
+    generation_kw = align_generation(load, generation)
+    battery = battery_parameters(battery)
+
+    capacity_kwh, summary, saturation_kwh = solve_capacity(load_kw, generation_kw, target, target_value, charge_efficiency, discharge_efficiency, tolerance_kwh, battery)
+
+    # Unlimited storage behaves the same as the saturation capacity
+    if summary is None:
+        summary = evaluate_capacity(load_kw, generation_kw, capacity_kwh if np.isfinite(capacity_kwh) else saturation_kwh, charge_efficiency, discharge_efficiency, battery)
+
+    return pd.Series({
+        'Target': target,
+        'Target Value': target_value,
+        'Storage Capacity (KWH)': capacity_kwh,
+        'Peak Storage Power (KW)': float(summary['Peak Storage Power (KW)']),
+        'Grid Usage KWH': float(summary['Grid Usage KWH']),
+        'Grid Supply KWH': float(summary['Grid Supply KWH']),
+        'Renewable Fraction': float(summary['Renewable Fraction']),
+        'Sustainable': bool(summary['Sustainable']),
+    })
+
+
+if __name__ == "__main__":
+    from load_modelling import calculate_annual_load, get_total_load
+    from generation_modelling import calculate_annual_generation, reorder_generation
+
+    annual_load = get_total_load(calculate_annual_load())
+    annual_generation = reorder_generation(calculate_annual_generation(), annual_load['datetime'].iloc[0])
+
+    print("-------------- Storage Sizing ----------------")
+    print(size_storage(annual_load, annual_generation, 'self_sufficient').to_string())
+    print(size_storage(annual_load, annual_generation, 'sustainable').to_string())
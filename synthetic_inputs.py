@@ -0,0 +1,149 @@
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+import openpyxl
+
+from load_modelling import RNA_SET_TIMES_FILE, CARDRONA_LOAD_FILE, HOUSEHOLD_LOAD_FILE, LOAD_TIME_STEP_MINUTES
+from generation_modelling import WIND_DATA_FILE, POWER_CURVE_DATA_FILE
+from solar_modelling import SOLAR_DATA_FILE, SOLAR_TIME_COLUMN, IRRADIANCE_COLUMN, AIR_TEMPERATURE_COLUMN
+from year_calendar import slots_per_day
+
+# Synthetic inputs with the same layout as the (private) Input Data files, for benchmarks and trying the models out
+WIND_START = '2000-01-01'
+WIND_YEARS = 4 # Enough years that every time of year has readings after the dropouts are removed
+LOAD_START = '2022-09-01' # Load year, containing the festival and both household seasons
+FESTIVAL_START = '2022-12-29'
+FESTIVAL_SLOTS = 192 # Four days of half-hourly set times
+FESTIVAL_STAGES = 5
+TURBINE_RATINGS_KW = {'V90-2.0MW': 2000, 'V150-4.2MW': 4200}
+SITE_LATITUDE_DEG = -44.87 # Cardrona Valley
+SYNTHETIC_DIRECTORY = 'Synthetic Data' # Kept apart from the real Input Data
+
+
+def synthetic_wind_data(years=1, time_step_minutes=15, start=WIND_START, rng=None):
+    """Returns wind speed readings in the layout of Wind Cardrona.csv, with a daily cycle, gusts and zero readings where the sensor dropped out"""
+    rng = np.random.default_rng() if rng is None else rng
+    times = pd.date_range(start, pd.Timestamp(start) + pd.DateOffset(years=years), freq=f'{time_step_minutes}min', inclusive='left')
+
+    daily_cycle = 1 + 0.3 * np.sin(2 * np.pi * (times.hour.to_numpy() + times.minute.to_numpy() / 60) / 24)
+    seasonal_cycle = 1 + 0.2 * np.cos(2 * np.pi * times.dayofyear.to_numpy() / 365.25)
+    wind_speed_kph = rng.gamma(2.0, 11, len(times)) * daily_cycle * seasonal_cycle
+    wind_speed_kph[rng.random(len(times)) < 0.02] = 0
+
+    return pd.DataFrame({
+        'Time': times.strftime('%d/%m/%Y %H:%M'),
+        'Cardrona - Ridgeline Stn 15min: WindSpd_kph_mean[KPH]': wind_speed_kph.round(1),
+    })
+
+
+def synthetic_solar_data(years=1, time_step_minutes=15, start=WIND_START, latitude_deg=SITE_LATITUDE_DEG, rng=None):
+    """Returns irradiance and air temperature readings in the layout of Solar Cardrona.csv: clear-sky irradiance
+    from the sun's elevation, dimmed by a random cloudiness each day, and a seasonal and daily temperature cycle"""
+    rng = np.random.default_rng() if rng is None else rng
+    times = pd.date_range(start, pd.Timestamp(start) + pd.DateOffset(years=years), freq=f'{time_step_minutes}min', inclusive='left')
+    day_of_year = times.dayofyear.to_numpy()
+    hour = times.hour.to_numpy() + times.minute.to_numpy() / 60
+
+    # Solar elevation from the declination and hour angle (solar time)
+    latitude = np.radians(latitude_deg)
+    declination = np.radians(23.45) * np.sin(2 * np.pi * (284 + day_of_year) / 365)
+    hour_angle = np.radians(15 * (hour - 12))
+    sin_elevation = np.sin(latitude) * np.sin(declination) + np.cos(latitude) * np.cos(declination) * np.cos(hour_angle)
+
+    day = (times.normalize() - times[0].normalize()).days.to_numpy()
+    clearness = rng.beta(5, 2, day[-1] + 1)[day]
+    irradiance_w_m2 = np.maximum(sin_elevation, 0) * 1000 * clearness
+
+    # Warmest in January (southern hemisphere), and mid-afternoon
+    air_temperature_c = 8 + 8 * np.cos(2 * np.pi * (day_of_year - 15) / 365.25) + 5 * np.cos(2 * np.pi * (hour - 15) / 24) + rng.normal(0, 1.5, len(times))
+
+    return pd.DataFrame({
+        SOLAR_TIME_COLUMN: times.strftime('%d/%m/%Y %H:%M'),
+        IRRADIANCE_COLUMN: irradiance_w_m2.round(1),
+        AIR_TEMPERATURE_COLUMN: air_temperature_c.round(1),
+    })
+
+
+def synthetic_load(years=1, start=LOAD_START, time_step_minutes=LOAD_TIME_STEP_MINUTES, rng=None):
+    """Returns a ski field load in the layout of Cardrona Load.xlsx (datetime, kW), busiest in winter and during the day"""
+    rng = np.random.default_rng() if rng is None else rng
+    datetimes = pd.date_range(start, pd.Timestamp(start) + pd.DateOffset(years=years), freq=f'{time_step_minutes}min', inclusive='left')
+
+    winter = np.isin(datetimes.month, [6, 7, 8, 9, 10])
+    daytime = (datetimes.hour >= 8) & (datetimes.hour < 17)
+    load_kw = 100 + 500 * winter + 250 * (winter & daytime) + rng.normal(0, 40, len(datetimes))
+
+    return pd.DataFrame({'Date': datetimes, 'kW': np.maximum(load_kw, 0).round(2)})
+
+
+def synthetic_household_profiles(rng=None):
+    """Returns half-hourly summer and winter household power (W) profiles"""
+    rng = np.random.default_rng() if rng is None else rng
+    hours = np.arange(slots_per_day(LOAD_TIME_STEP_MINUTES)) * LOAD_TIME_STEP_MINUTES / 60
+    evening_peak = np.exp(-((hours - 19) ** 2) / 8)
+    morning_peak = np.exp(-((hours - 7.5) ** 2) / 3)
+
+    summer_w = 300 + 600 * evening_peak + 200 * morning_peak + rng.normal(0, 20, len(hours))
+    winter_w = 700 + 1300 * evening_peak + 600 * morning_peak + rng.normal(0, 40, len(hours))
+
+    return summer_w.round(1), winter_w.round(1)
+
+
+def write_household_load(file, rng=None):
+    """Writes household profiles in the layout of Household Load.xlsx, a time and power column per season"""
+    summer_w, winter_w = synthetic_household_profiles(rng)
+    times = [datetime.time(minute // 60, minute % 60) for minute in range(0, 24 * 60, LOAD_TIME_STEP_MINUTES)]
+
+    # openpyxl keeps the times as Excel time cells, as in the original workbook
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['Time', 'Summer (W)', None, 'Time', 'Winter (W)'])
+    for time, summer_power_w, winter_power_w in zip(times, summer_w, winter_w):
+        sheet.append([time, float(summer_power_w), None, time, float(winter_power_w)])
+    workbook.save(file)
+
+
+def synthetic_set_times(start=FESTIVAL_START, slots=FESTIVAL_SLOTS, stages=FESTIVAL_STAGES, rng=None):
+    """Returns stage schedules in the layout of RNA Set Times.xlsx: a time and on/off column per stage, separated by blank columns"""
+    rng = np.random.default_rng() if rng is None else rng
+    datetimes = pd.date_range(start, periods=slots, freq=f'{LOAD_TIME_STEP_MINUTES}min')
+    evening = (datetimes.hour >= 14) | (datetimes.hour < 2)
+
+    columns = {}
+    for stage in range(stages):
+        columns[f'Stage {stage + 1} Time'] = datetimes
+        columns[f'Stage {stage + 1} On'] = (evening & (rng.random(slots) < 0.8)).astype(int)
+        if stage < stages - 1:
+            columns[f'Blank {stage + 1}'] = np.nan
+
+    return pd.DataFrame(columns)
+
+
+def synthetic_power_curves(ratings_kw=TURBINE_RATINGS_KW):
+    """Returns turbine power curves in the layout of the turbine curve workbook, one power output column per model"""
+    wind_speeds = np.arange(0, 40.5, 0.5)
+    power_curves = pd.DataFrame({'Wind Speed (m/s)': wind_speeds})
+    for turbine_model, rating_kw in ratings_kw.items():
+        rising = np.clip((wind_speeds - 3) / (12 - 3), 0, 1) ** 3
+        power_curves[f'{turbine_model} Power Output (KW)'] = np.where(wind_speeds < 25, rating_kw * rising, 0).round(1)
+
+    return power_curves
+
+
+def write_synthetic_inputs(directory='.', wind_years=WIND_YEARS, wind_time_step_minutes=15, seed=0):
+    """Writes every input file under directory, at the paths the models read them from"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(directory, os.path.dirname(WIND_DATA_FILE)), exist_ok=True)
+
+    synthetic_wind_data(wind_years, wind_time_step_minutes, rng=rng).to_csv(os.path.join(directory, WIND_DATA_FILE), index=False)
+    synthetic_solar_data(wind_years, wind_time_step_minutes, rng=rng).to_csv(os.path.join(directory, SOLAR_DATA_FILE), index=False)
+    synthetic_load(rng=rng).to_excel(os.path.join(directory, CARDRONA_LOAD_FILE), index=False)
+    write_household_load(os.path.join(directory, HOUSEHOLD_LOAD_FILE), rng)
+    synthetic_set_times(rng=rng).to_excel(os.path.join(directory, RNA_SET_TIMES_FILE), index=False)
+    synthetic_power_curves().to_excel(os.path.join(directory, POWER_CURVE_DATA_FILE), index=False)
+
+
+if __name__ == "__main__":
+    write_synthetic_inputs(SYNTHETIC_DIRECTORY)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from storage_and_grid_modelling import dispatch_storage, dispatch_storage_batch, StorageResult
+
+STEPS = 96
+LOAD_KW = np.full(STEPS, 100.0)
+SURPLUS_GENERATION_KW = np.full(STEPS, 1000.0)
+DATETIMES = np.arange('2023-01-01T00:00', STEPS * 30, 30, dtype='datetime64[m]').astype('datetime64[ns]')
+
+
+def test_permanent_surplus_with_self_discharge_is_sustainable():
+    """Self-discharge is made up by the surplus every step, so the storage ends the year full"""
+    for self_discharge_per_hour in [0, 1e-4, 0.01]:
+        dispatch = dispatch_storage(LOAD_KW, SURPLUS_GENERATION_KW, 1000, 0.9, 0.9, self_discharge_per_hour=self_discharge_per_hour)
+        result = StorageResult(DATETIMES, dispatch, 1000)
+        assert result.metrics['Final Stored Energy (KWH)'] == 1000
+        assert result.metrics['Sustainable']
+
+    summary = dispatch_storage_batch(LOAD_KW, SURPLUS_GENERATION_KW, 1000, 0.9, 0.9, self_discharge_per_hour=np.array([0, 1e-4, 0.01]))
+    assert summary['Sustainable'].all()
+
+
+def test_faded_storage_ending_full_is_sustainable():
+    """A storage that ends full at its faded capacity is sustainable in both dispatch kernels"""
+    generation_kw = np.where(np.arange(STEPS) < STEPS // 2, 0.0, 1000.0)
+    dispatch = dispatch_storage(LOAD_KW, generation_kw, 1000, 0.9, 0.9, capacity_fade_per_cycle=0.01)
+    result = StorageResult(DATETIMES, dispatch, 1000)
+    assert result.metrics['Remaining Capacity (KWH)'] < 1000
+    assert result.metrics['Sustainable']
+
+    summary = dispatch_storage_batch(LOAD_KW, generation_kw, [1000], 0.9, 0.9, capacity_fade_per_cycle=0.01)
+    assert summary['Sustainable'].all()
+    np.testing.assert_allclose(summary['Final Stored Energy (KWH)'], result.metrics['Final Stored Energy (KWH)'])
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+# Year independent series (e.g. averaged wind) are keyed on a leap-year calendar so Feb 29th has its own slots
+LEAP_YEAR = 2000
+MONTH_DATE_TIME_FORMAT = '%m-%d %H:%M:%S'
+RESAMPLE_MODES = ('sample', 'mean')
+
+
+def slots_per_day(time_step_minutes):
+    """Returns the number of time steps in a day"""
+    if (24 * 60) % time_step_minutes != 0:
+        raise ValueError("Time step of {} minutes does not divide a day".format(time_step_minutes))
+
+    return 24 * 60 // time_step_minutes
+
+
+def leap_year_slot(times, time_step_minutes):
+    """Returns an integer slot key for each timestamp: leap-year day of year x slots per day + time of day slot"""
+    times = pd.DatetimeIndex(times)
+    day_of_year = times.dayofyear.to_numpy() - 1
+
+    # Shift days after February in non-leap years so every calendar date has the same key in every year
+    day_of_year += ~times.is_leap_year & (times.month.to_numpy() > 2)
+    seconds_of_day = times.hour.to_numpy() * 3600 + times.minute.to_numpy() * 60 + times.second.to_numpy()
+
+    return day_of_year * slots_per_day(time_step_minutes) + seconds_of_day // (time_step_minutes * 60)
+
+
+def leap_year_slot_labels(time_step_minutes):
+    """Returns the Month-Date-Time label of every leap-year slot"""
+    leap_year = pd.date_range(f'{LEAP_YEAR}-01-01', periods=366 * slots_per_day(time_step_minutes), freq=f'{time_step_minutes}min')
+
+    return leap_year.strftime(MONTH_DATE_TIME_FORMAT).to_numpy()
+
+
+def month_date_time_slot(month_date_time, time_step_minutes):
+    """Returns the leap-year slot key of Month-Date-Time labels"""
+    times = pd.to_datetime(f'{LEAP_YEAR}-' + pd.Series(month_date_time, dtype=str), format=f'%Y-{MONTH_DATE_TIME_FORMAT}')
+
+    return leap_year_slot(times, time_step_minutes)
+
+
+class YearCalendar:
+    """Integer slot index for a modelled year (or any period) at a fixed time step.
+    Every series is mapped to slot offsets so alignment is array indexing rather than datetime joins"""
+
+    def __init__(self, start, time_step_minutes=30, end=None):
+        self.start = pd.Timestamp(start)
+        self.end = self.start + pd.DateOffset(years=1) if end is None else pd.Timestamp(end)
+        self.time_step_minutes = time_step_minutes
+        self.time_step = pd.Timedelta(minutes=time_step_minutes)
+        self.slots = (self.end - self.start) // self.time_step
+
+    @classmethod
+    def from_datetimes(cls, datetimes):
+        """Creates the calendar of a regular datetime series, checking it has no gaps"""
+        datetimes = pd.DatetimeIndex(datetimes)
+        time_step = datetimes[1] - datetimes[0]
+        calendar = cls(datetimes[0], int(time_step / pd.Timedelta(minutes=1)), datetimes[-1] + time_step)
+
+        if not datetimes.equals(calendar.datetimes()):
+            raise ValueError("Datetimes are not a regular {} minute series".format(calendar.time_step_minutes))
+
+        return calendar
+
+    def datetimes(self):
+        """Returns the start datetime of every slot"""
+        return pd.date_range(self.start, periods=self.slots, freq=self.time_step)
+
+    def slot_index(self, datetimes):
+        """Returns the slot offset of each datetime, which must lie on the calendar"""
+        offsets = pd.DatetimeIndex(datetimes) - self.start
+        slot, remainder = np.divmod(offsets.to_numpy(), self.time_step.to_timedelta64())
+
+        if (remainder != np.timedelta64(0)).any():
+            raise ValueError("{} datetimes are not on the {} minute calendar".format(np.sum(remainder != np.timedelta64(0)), self.time_step_minutes))
+        if ((slot < 0) | (slot >= self.slots)).any():
+            raise ValueError("{} datetimes are outside {} to {}".format(np.sum((slot < 0) | (slot >= self.slots)), self.start, self.end))
+
+        return slot.astype(np.int64)
+
+    def place(self, datetimes, values, fill=0.0):
+        """Places a series (e.g. a festival schedule) onto the calendar, filling the other slots"""
+        placed = np.full(self.slots, fill, dtype=float)
+        placed[self.slot_index(datetimes)] = values
+
+        return placed
+
+    def from_climatology(self, climatology, time_step_minutes, resample='sample'):
+        """Returns a year independent series (one value per leap-year slot) for each slot of this calendar.
+        Feb 29th is only used in leap years. A finer climatology is either sampled at the start of each slot or averaged"""
+        if resample not in RESAMPLE_MODES:
+            raise ValueError("Unknown resample mode '{}', expected one of {}".format(resample, RESAMPLE_MODES))
+        if self.time_step_minutes % time_step_minutes != 0:
+            raise ValueError("Calendar time step of {} minutes is not a multiple of the {} minute climatology".format(self.time_step_minutes, time_step_minutes))
+
+        climatology = np.asarray(climatology, dtype=float)
+        steps_per_slot = int(self.time_step_minutes // time_step_minutes)
+        first_step = leap_year_slot(self.datetimes(), time_step_minutes)
+
+        if resample == 'sample':
+            values = climatology[first_step]
+        else:
+            values = climatology[first_step[:, np.newaxis] + np.arange(steps_per_slot)].mean(axis=1)
+
+        if np.isnan(values).any():
+            raise ValueError("Climatology is missing values for {} slots from {}".format(np.sum(np.isnan(values)), self.start))
+
+        return values
+
+    def resample(self, values, calendar, resample='sample'):
+        """Converts values on another calendar covering the same period to this calendar's time step"""
+        values = np.asarray(values)
+        if calendar.start != self.start or calendar.end != self.end:
+            raise ValueError("Calendars cover different periods")
+
+        coarser, finer = sorted([calendar.time_step_minutes, self.time_step_minutes], reverse=True)
+        if coarser % finer != 0:
+            raise ValueError("Time steps of {} and {} minutes do not nest".format(coarser, finer))
+        if resample not in RESAMPLE_MODES:
+            raise ValueError("Unknown resample mode '{}', expected one of {}".format(resample, RESAMPLE_MODES))
+
+        if calendar.time_step_minutes == self.time_step_minutes:
+            return values
+        if calendar.time_step_minutes > self.time_step_minutes:
+            # Coarser values are held constant across each finer slot
+            return np.repeat(values, int(calendar.time_step_minutes // self.time_step_minutes), axis=0)
+
+        steps_per_slot = int(self.time_step_minutes // calendar.time_step_minutes)
+        if resample == 'sample':
+            return values[::steps_per_slot]
+
+        return values.reshape((self.slots, steps_per_slot) + values.shape[1:]).mean(axis=1)